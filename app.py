@@ -1,12 +1,12 @@
 # app.py
 import streamlit as st
-import pandas as pd
-import time
-import uuid
 
 # These need to be imported to be used in the helper functions
 from src.core.orchestrator import run_standardization_pipeline
 from src.agents.semantic_agent import SemanticSearchAgent
+from src.agents.embedding_snapshot import DEFAULT_SNAPSHOT_DIR
+from src.core.record_store import RecordStore
+from src.agents.alias_table import AliasTable
 
 # --- Page Configuration ---
 st.set_page_config(layout="wide", page_title="AI Agent Squad")
@@ -14,61 +14,50 @@ st.set_page_config(layout="wide", page_title="AI Agent Squad")
 # --- State Management ---
 if 'flagged_items' not in st.session_state:
     st.session_state.flagged_items = []
-if 'companies_df' not in st.session_state:
-    st.session_state.companies_df = None
-if 'employees_df' not in st.session_state:
-    st.session_state.employees_df = None
 # *** NEW: State for success message ***
 if 'success_message' not in st.session_state:
     st.session_state.success_message = None
 
 # --- Helper Functions ---
-def save_dataframes():
-    """Saves the current state of the DataFrames back to the CSV files."""
+def save_employee(first_name, last_name, corrected_company_name, user_input):
+    """Saves the new employee record to the shared store (one indexed lookup and one insert)."""
     try:
-        st.session_state.companies_df.to_csv("data/enterprise_companies.csv", index=False)
-        st.session_state.employees_df.to_csv("data/enterprise_employees.csv", index=False)
+        if record_store.add_employee(first_name, last_name, corrected_company_name, user_input) is None:
+            st.error(f"Could not find CompanyID for '{corrected_company_name}'. Employee not saved.")
+            return False
         return True
     except Exception as e:
-        st.error(f"Failed to save changes to CSV: {e}")
+        st.error(f"Failed to save the employee record: {e}")
         return False
 
-def add_employee_to_session(first_name, last_name, corrected_company_name, user_input):
-    """Adds the new employee record to the session state DataFrame."""
-    company_row = st.session_state.companies_df[st.session_state.companies_df['CompanyName'] == corrected_company_name]
-    if not company_row.empty:
-        company_id = company_row.iloc[0]['CompanyID']
-        new_employee = {
-            "EmployeeID": str(uuid.uuid4()), "FirstName": first_name, "LastName": last_name,
-            "Email": f"{first_name.lower()}.{last_name.lower()}@example.com", "Title": "Newly Registered",
-            "CompanyID": company_id, "SubmittedCompanyName": user_input
-        }
-        st.session_state.employees_df.loc[len(st.session_state.employees_df)] = new_employee
-    else:
-        st.error(f"Could not find CompanyID for '{corrected_company_name}'. Employee not saved.")
-
 # --- Global Setup & Caching ---
 @st.cache_resource
-def get_semantic_agent(companies_df):
-    """Loads the heavy semantic agent only once."""
-    canonical_names = companies_df['CompanyName'].tolist()
-    return SemanticSearchAgent(canonical_names=canonical_names)
+def get_record_store():
+    """Opens the companies/employees store shared with the API (seeded from the CSVs on first run)."""
+    return RecordStore()
 
-def load_data():
-    """Loads data into the session state."""
-    if st.session_state.companies_df is None:
-        try:
-            st.session_state.companies_df = pd.read_csv("data/enterprise_companies.csv")
-            st.session_state.employees_df = pd.read_csv("data/enterprise_employees.csv")
-        except FileNotFoundError:
-            return False
-    return True
+@st.cache_resource
+def get_alias_table(_record_store):
+    """Aliases learned from earlier admin approvals, resolved before the agents run."""
+    return AliasTable(_record_store.aliases())
+
+@st.cache_resource
+def get_semantic_agent(_record_store):
+    """
+    Loads the heavy semantic agent only once. The store is not part of
+    the cache key (leading underscore), so adding a company updates the
+    agent incrementally instead of rebuilding it.
+    """
+    canonical_names = _record_store.company_names()
+    return SemanticSearchAgent(canonical_names=canonical_names, snapshot_dir=DEFAULT_SNAPSHOT_DIR)
 
 # --- Main App Execution ---
-if not load_data():
+record_store = get_record_store()
+if not record_store.company_count():
     st.error("Data files not found. Please run `python scripts/generate_enterprise_data.py` first.")
 else:
-    semantic_agent = get_semantic_agent(st.session_state.companies_df)
+    semantic_agent = get_semantic_agent(record_store)
+    alias_table = get_alias_table(record_store)
     st.title("🛡️ AI Agent Squad: Data Standardization & Learning")
     
     # *** NEW: Display success message from previous action ***
@@ -94,17 +83,22 @@ else:
             if submitted:
                 # ... (o mesmo código para rodar o pipeline e mostrar o veredito) ...
                  with st.status("Agent Pipeline Initialized...", expanded=True) as status:
-                    st.write("TriageAgent is performing a high-speed lexical scan...")
-                    time.sleep(1)
-                    final_result = run_standardization_pipeline(user_input_company, semantic_agent)
+                    timings = {}
+                    final_result = run_standardization_pipeline(user_input_company, semantic_agent, timings=timings, aliases=alias_table)
+                    # Real per-stage timings instead of staged pauses
+                    ms = {stage: seconds * 1000.0 for stage, seconds in timings.items()}
+                    if final_result.get("status") == "RESOLVED_BY_ALIAS":
+                        st.write(f"Normalization stage found a known name or alias in {ms.get('alias', 0.0):.3f} ms.")
+                    else:
+                        st.write(f"TriageAgent performed a lexical scan in {ms.get('triage', 0.0):.1f} ms.")
                     evidence = final_result.get("evidence", {})
                     if evidence:
                         st.write(f"TriageAgent Result: Ambiguous match (`{evidence.get('best_match_lexical')}`). Escalating...")
-                        time.sleep(1); st.write("SemanticSearchAgent is analyzing contextual meaning...")
-                        time.sleep(1); st.write(f"SemanticAgent Result: Strong semantic link to `{evidence.get('best_match_semantic')}`.")
-                        time.sleep(1); st.write("DecisionAgent is reviewing all evidence...")
-                        time.sleep(1)
-                    status.update(label="Mission Complete!", state="complete", expanded=False)
+                        st.write(f"SemanticSearchAgent analyzed contextual meaning in {ms.get('semantic', 0.0):.1f} ms.")
+                        st.write(f"SemanticAgent Result: Strong semantic link to `{evidence.get('best_match_semantic')}`.")
+                        if "decision" in ms:
+                            st.write(f"DecisionAgent reviewed all evidence in {ms['decision']:.1f} ms.")
+                    status.update(label=f"Mission Complete! ({sum(ms.values()):.1f} ms)", state="complete", expanded=False)
                 
                  st.subheader("Final Verdict")
                  action = final_result.get("action")
@@ -113,9 +107,8 @@ else:
                 
                  if action == "AUTO_CORRECT":
                     st.success(f"✅ **Action: Auto-Corrected to `{best_match}`**")
-                    add_employee_to_session(first_name, last_name, best_match, user_input_company)
-                    if save_dataframes():
-                        st.toast("Employee record saved to CSV!", icon="💾")
+                    if save_employee(first_name, last_name, best_match, user_input_company):
+                        st.toast("Employee record saved!", icon="💾")
                  else: # FLAG_FOR_REVIEW
                     st.error(f"🚩 **Action: Flag for Human Review**")
                     st.session_state.flagged_items.append({
@@ -149,19 +142,21 @@ else:
                             new_state = st.text_input("State (Abbr.)", key=f"state_{i}")
                             new_country = st.text_input("Country (Abbr.)", value="USA", key=f"country_{i}")
                             if st.form_submit_button("Confirm & Save"):
-                                new_id = st.session_state.companies_df['CompanyID'].max() + 1
-                                new_row = {'CompanyID': new_id, 'CompanyName': item['user_input'], 'City': new_city, 'State': new_state, 'Country': new_country}
-                                st.session_state.companies_df.loc[len(st.session_state.companies_df)] = new_row
-                                add_employee_to_session(item['first_name'], item['last_name'], item['user_input'], item['user_input'])
-                                if save_dataframes():
-                                    st.session_state.success_message = f"✅ Success! New company '{item['user_input']}' and employee record were saved to CSV."
+                                record_store.add_company(item['user_input'], new_city, new_state, new_country)
+                                # Only the new name is embedded; the agent swaps its indexes in place
+                                semantic_agent.add_canonical_names([item['user_input']])
+                                if save_employee(item['first_name'], item['last_name'], item['user_input'], item['user_input']):
+                                    st.session_state.success_message = f"✅ Success! New company '{item['user_input']}' and employee record were saved."
                                 st.session_state.flagged_items.pop(i)
                                 st.rerun()
                     else:
                         if c2.button("✅ Approve Suggestion", key=f"approve_{i}"):
-                            add_employee_to_session(item['first_name'], item['last_name'], item['best_guess'], item['user_input'])
-                            if save_dataframes():
-                                st.session_state.success_message = f"✅ Success! Employee record for '{item['best_guess']}' was saved to CSV."
+                            if save_employee(item['first_name'], item['last_name'], item['best_guess'], item['user_input']):
+                                # The save found the suggestion's CompanyID, so it is a real company (not 'N/A'):
+                                # the approved input becomes an alias, and next time it resolves by a hash lookup
+                                record_store.add_alias(item['user_input'], item['best_guess'])
+                                alias_table.add(item['user_input'], item['best_guess'])
+                                st.session_state.success_message = f"✅ Success! Employee record for '{item['best_guess']}' was saved."
                             st.session_state.flagged_items.pop(i)
                             st.rerun()
 
@@ -1,10 +1,29 @@
 # run_service.py
-import streamlit as st
-import pandas as pd
+import asyncio
+import os
+import time
+from functools import lru_cache
 from fastapi import FastAPI, HTTPException
-from src.schema import StandardizationRequest, StandardizationResponse
-from src.core.orchestrator import run_standardization_pipeline
+from fastapi.responses import PlainTextResponse
+from pydantic import ValidationError
+from src.schema import (
+    StandardizationRequest, StandardizationResponse,
+    StandardizationBatchRequest, StandardizationBatchResponse,
+    StandardizationRecordsRequest, StandardizationRecordsResponse
+)
+from src.core.orchestrator import (
+    run_standardization_pipeline_async, run_batch_standardization_pipeline_async, run_multi_field_pipeline_async,
+    DEFAULT_DECISION_RULES
+)
 from src.agents.semantic_agent import SemanticSearchAgent
+from src.core.inference_server import RemoteSemanticAgent
+from src.agents.embedding_snapshot import DEFAULT_SNAPSHOT_DIR
+from src.core.resolution_cache import ResolutionCache
+from src.core.record_store import RecordStore, DEFAULT_STORE_PATH
+from src.core.entity_schema import COMPANY_FIELD, load_entity_schema, build_field_agents, build_field_caches
+from src.agents.alias_table import AliasTable
+from src.core.concurrency import RequestLimiter, create_cpu_executor
+from src.core.metrics import METRICS, METRIC_PREFIX, format_sample
 
 # --- App Initialization ---
 app = FastAPI(
@@ -15,32 +34,223 @@ app = FastAPI(
 
 # --- Singleton Pattern for Agent ---
 # This ensures the heavy model is loaded only once when the service starts.
-@st.cache_resource
+# Canonical embeddings are memory-mapped from a snapshot on disk when one
+# matches the current list, so a restart does not re-encode everything.
+SNAPSHOT_DIR = os.getenv("EMBEDDING_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+# "quantized" keeps a float16/int8 copy in memory and re-ranks against the mapped snapshot
+VECTOR_INDEX = os.getenv("VECTOR_INDEX", "exact")
+VECTOR_INDEX_OPTIONS = {"precision": os.getenv("VECTOR_INDEX_PRECISION", "int8")} if VECTOR_INDEX == "quantized" else {}
+
+# The same store the Streamlit app writes to, so companies confirmed there are visible here
+RECORD_STORE_PATH = os.getenv("RECORD_STORE_PATH", DEFAULT_STORE_PATH)
+record_store = RecordStore(RECORD_STORE_PATH)
+
+def read_canonical_names():
+    """Reads the canonical company names from the record store."""
+    return record_store.company_names()
+
+# --- Multi-Worker Mode ---
+# With several uvicorn workers, start `scripts/run_inference_server.py` once per node and set
+# INFERENCE_SERVER_ADDRESS: each worker then keeps only the names and lexical indexes, and the
+# model and embeddings are loaded once, in the inference server. Workers authenticate with
+# INFERENCE_SERVER_AUTHKEY, or with the key file the server writes on first start.
+INFERENCE_SERVER_ADDRESS = os.getenv("INFERENCE_SERVER_ADDRESS")
+
+@lru_cache(maxsize=None)
 def get_semantic_agent_cached():
-    """Loads and caches the SemanticSearchAgent."""
-    try:
-        companies_df = pd.read_csv("data/enterprise_companies.csv")
-        canonical_names = companies_df['CompanyName'].tolist()
-        return SemanticSearchAgent(canonical_names=canonical_names)
-    except FileNotFoundError:
+    """Loads and caches the SemanticSearchAgent (or the client of the shared inference server)."""
+    if INFERENCE_SERVER_ADDRESS:
+        try:
+            return RemoteSemanticAgent(INFERENCE_SERVER_ADDRESS)
+        except (ConnectionError, RuntimeError) as e:
+            print(f"Could not reach the inference server at {INFERENCE_SERVER_ADDRESS}: {e}")
+            return None
+    canonical_names = read_canonical_names()
+    if not canonical_names:
+        print(f"No companies in '{RECORD_STORE_PATH}'. Run `python scripts/generate_enterprise_data.py` first.")
         return None
+    return SemanticSearchAgent(canonical_names=canonical_names, snapshot_dir=SNAPSHOT_DIR,
+                               index_kind=VECTOR_INDEX, **VECTOR_INDEX_OPTIONS)
 
 semantic_agent = get_semantic_agent_cached()
 
+# Verdicts are cached per canonical list version, so editing the company list invalidates them
+resolution_cache = ResolutionCache(semantic_agent.state.version) if semantic_agent else None
+
+# --- Multi-Field Standardization ---
+# One agent per field of the entity schema (company, city, state, country by default; set
+# ENTITY_SCHEMA_PATH to a JSON file to change them). The extra agents reuse the company
+# agent's encoder, so the model is still loaded once. With an inference server, only the
+# company field is available, since the model lives in the server process.
+ENTITY_SCHEMA = load_entity_schema(os.getenv("ENTITY_SCHEMA_PATH"))
+field_agents, field_caches = {}, {}
+if semantic_agent:
+    field_agents = {COMPANY_FIELD: semantic_agent}
+    if not INFERENCE_SERVER_ADDRESS:
+        field_agents = build_field_agents(ENTITY_SCHEMA, record_store, SNAPSHOT_DIR, agents=field_agents)
+    field_caches = build_field_caches(field_agents, caches={COMPANY_FIELD: resolution_cache})
+
+# Aliases learned from admin approvals in the app, per field; refreshed by /canonical/reload
+field_aliases = {field: AliasTable(record_store.aliases(field)) for field in field_agents}
+alias_table = field_aliases.get(COMPANY_FIELD)
+
+# --- Concurrency Model ---
+# CPU-bound stages run on a bounded pool so the event loop stays free, and
+# requests beyond the pending limit are rejected instead of piling up.
+cpu_executor = create_cpu_executor()
+request_limiter = RequestLimiter()
+
+def _admit_request():
+    """Rejects the request with 503 when the service is already at capacity."""
+    if not semantic_agent:
+        METRICS.increment("errors", kind="agent_not_loaded")
+        raise HTTPException(status_code=503, detail="Semantic agent not initialized. Please check server logs.")
+    if not request_limiter.try_acquire():
+        METRICS.increment("errors", kind="at_capacity")
+        raise HTTPException(status_code=503, detail="Service is at capacity. Please retry shortly.", headers={"Retry-After": "1"})
+
+def _with_timings(result: dict, timings: dict, started: float) -> dict:
+    """
+    Copies the verdict with the stage timings (ms) added to its evidence.
+    A copy, because cached verdicts are shared between requests.
+    """
+    breakdown = {stage: round(seconds * 1000.0, 3) for stage, seconds in timings.items()}
+    breakdown["total"] = round((time.perf_counter() - started) * 1000.0, 3)
+    return {**result, "evidence": {**(result.get("evidence") or {}), "timings_ms": breakdown}}
+
+def _to_response(result: dict) -> StandardizationResponse:
+    """
+    Validates one verdict on its own, so a malformed verdict is flagged for
+    review instead of failing every other item of a batch with a 500.
+    """
+    try:
+        return StandardizationResponse(**result)
+    except ValidationError as e:
+        METRICS.increment("errors", kind="invalid_verdict")
+        return StandardizationResponse(status="ERROR", action="FLAG_FOR_REVIEW", reason=f"Invalid verdict: {e.error_count()} error(s).")
+
 # --- API Endpoints ---
 @app.post("/standardize", response_model=StandardizationResponse)
 async def standardize_data(request: StandardizationRequest):
     """
     Receives company name and returns the standardization verdict from the AI Agent Squad.
     """
+    _admit_request()
+    started, timings = time.perf_counter(), {}
+    try:
+        final_result = await run_standardization_pipeline_async(request.company_name, semantic_agent, cpu_executor,
+                                                                 resolution_cache, timings=timings, aliases=alias_table)
+    finally:
+        request_limiter.release()
+    METRICS.observe("request", time.perf_counter() - started)
+
+    if request.include_timings:
+        final_result = _with_timings(final_result, timings, started)
+    return _to_response(final_result)
+
+@app.post("/standardize/batch", response_model=StandardizationBatchResponse)
+async def standardize_data_batch(request: StandardizationBatchRequest):
+    """
+    Receives a list of company names and returns one verdict per name, in the same order.
+    """
+    _admit_request()
+    started, timings = time.perf_counter(), {}
+    try:
+        final_results = await run_batch_standardization_pipeline_async(request.company_names, semantic_agent, cpu_executor,
+                                                                       resolution_cache, timings=timings, aliases=alias_table)
+    finally:
+        request_limiter.release()
+    METRICS.observe("batch_request", time.perf_counter() - started)
+
+    if request.include_timings:
+        final_results = [_with_timings(result, timings, started) for result in final_results]
+    return StandardizationBatchResponse(results=[_to_response(result) for result in final_results])
+
+@app.post("/standardize/records", response_model=StandardizationRecordsResponse)
+async def standardize_records(request: StandardizationRecordsRequest):
+    """
+    Receives records with several fields (e.g. company and city) and returns
+    one verdict per field of each record. The values of every field that
+    need the Semantic Agent are encoded together in one model call.
+    """
+    unknown = {field for record in request.records for field in record} - set(field_agents)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                                                    f"Available: {', '.join(field_agents)}.")
+    _admit_request()
+    started, timings = time.perf_counter(), {}
+    try:
+        final_results = await run_multi_field_pipeline_async(request.records, field_agents, cpu_executor,
+                                                             field_caches, timings=timings, aliases=field_aliases)
+    finally:
+        request_limiter.release()
+    METRICS.observe("records_request", time.perf_counter() - started)
+
+    if request.include_timings:
+        final_results = [{field: _with_timings(result, timings, started) for field, result in record_results.items()}
+                         for record_results in final_results]
+    return StandardizationRecordsResponse(results=[
+        {field: _to_response(result) for field, result in record_results.items()}
+        for record_results in final_results
+    ])
+
+@app.post("/canonical/reload")
+async def reload_canonical_list():
+    """
+    Re-reads the company list (and the other fields' canonical values) and
+    applies only the added and removed names to the running agents, so new
+    companies confirmed by an admin are picked up without restarting or
+    re-encoding the whole list. Aliases approved in the app are re-read too.
+    """
     if not semantic_agent:
         raise HTTPException(status_code=503, detail="Semantic agent not initialized. Please check server logs.")
-        
-    final_result = run_standardization_pipeline(request.company_name, semantic_agent)
-    
-    return StandardizationResponse(**final_result)
+    loop = asyncio.get_running_loop()
+    previous = len(semantic_agent.canonical_names)
+    state = await loop.run_in_executor(cpu_executor, lambda: semantic_agent.sync_canonical_names(read_canonical_names()))
+    fields = {COMPANY_FIELD: len(state.canonical_names)}
+    for field, agent in field_agents.items():
+        if field != COMPANY_FIELD:
+            field_state = await loop.run_in_executor(
+                cpu_executor, lambda: agent.sync_canonical_names(ENTITY_SCHEMA[field].canonical_values(record_store))
+            )
+            fields[field] = len(field_state.canonical_names)
+    for field, aliases in field_aliases.items():
+        aliases.replace(record_store.aliases(field))
+
+    # Cached verdicts from the old lists are dropped by the pipeline when it sees the new versions
+    return {"canonical_names": len(state.canonical_names), "previous_canonical_names": previous, "version": state.version,
+            "fields": fields, "aliases": {field: len(aliases) for field, aliases in field_aliases.items()}}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Stage latencies, outcome and error counters, and service gauges in the Prometheus text format."""
+    lines = METRICS.render()
+    gauges = {"requests_in_flight": request_limiter.in_flight}
+    counters = {"requests_rejected": request_limiter.rejected, **{
+        f"rules_{name}": value for name, value in DEFAULT_DECISION_RULES.stats().items()
+    }}
+    if resolution_cache:
+        cache_stats = resolution_cache.stats()
+        gauges["cache_memory_entries"] = cache_stats["memory_entries"]
+        counters.update(cache_memory_hits=cache_stats["memory_hits"], cache_disk_hits=cache_stats["disk_hits"],
+                        cache_misses=cache_stats["misses"])
+    if semantic_agent:
+        gauges["canonical_names"] = len(semantic_agent.canonical_names)
+    for name, value in gauges.items():
+        lines += [f"# TYPE {METRIC_PREFIX}_{name} gauge", format_sample(f"{METRIC_PREFIX}_{name}", value)]
+    for name, value in counters.items():
+        lines += [f"# TYPE {METRIC_PREFIX}_{name}_total counter", format_sample(f"{METRIC_PREFIX}_{name}_total", value)]
+    return "\n".join(lines) + "\n"
 
 @app.get("/health")
 def health_check():
     """Health check endpoint to verify service status."""
-    return {"status": "ok", "semantic_agent_loaded": semantic_agent is not None}
\ No newline at end of file
+    return {
+        "status": "ok",
+        "semantic_agent_loaded": semantic_agent is not None,
+        "semantic_agent_memory": semantic_agent.memory_footprint() if semantic_agent else None,
+        "fields": {field: len(agent.canonical_names) for field, agent in field_agents.items()},
+        "resolution_cache": resolution_cache.stats() if resolution_cache else None,
+        "decision_rules": DEFAULT_DECISION_RULES.stats(),
+        "requests": request_limiter.stats()
+    }
\ No newline at end of file
@@ -0,0 +1,140 @@
+# scripts/benchmark_pipeline.py
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Allow `python scripts/benchmark_pipeline.py` from the project root to import `src`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents import decision_agent
+from src.agents.alias_table import AliasTable
+from src.agents.semantic_agent import SemanticSearchAgent
+from src.agents.vector_index import compare_with_exact
+from src.core.orchestrator import run_batch_standardization_pipeline
+from src.core.record_store import RecordStore, DEFAULT_STORE_PATH, load_company_list
+from src.core.resolution_cache import ResolutionCache, canonical_list_version
+
+# --- Configuration ---
+DEFAULT_EMPLOYEES_PATH = "data/enterprise_employees.csv"
+DEFAULT_LIMIT = 10_000
+DEFAULT_BATCH_SIZE = 1   # One record per call, like a request to /standardize
+ACCURACY_SAMPLE_SIZE = 1_000  # Submissions embedded to compare a compact or approximate index with exact search
+STAGES = ("alias", "cache", "triage", "semantic", "embedding", "search", "rules", "decision")
+PERCENTILES = (50, 90, 99)
+
+def percentiles_ms(samples) -> dict:
+    """p50/p90/p99 and max of a list of durations in seconds, reported in milliseconds."""
+    if not samples:
+        return {}
+    values = np.asarray(samples) * 1000.0
+    stats = {f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES}
+    stats["max"] = float(values.max())
+    return stats
+
+def run_benchmark(submissions: pd.DataFrame, semantic_agent: SemanticSearchAgent, company_ids: dict,
+                  batch_size: int = DEFAULT_BATCH_SIZE, cache: ResolutionCache = None, aliases: AliasTable = None) -> dict:
+    """
+    Runs the submissions through the pipeline `batch_size` records per call
+    and compares every verdict with the CompanyID ground truth. Stage
+    latencies are per call; a stage only counts calls that reached it.
+    """
+    names = submissions["SubmittedCompanyName"].fillna("").astype(str).tolist()
+    truth = submissions["CompanyID"].tolist()
+    call_latencies, stage_latencies = [], {stage: [] for stage in STAGES}
+    statuses, correct, auto_corrected, wrong = {}, 0, 0, 0
+
+    start = time.perf_counter()
+    for offset in range(0, len(names), batch_size):
+        batch = names[offset:offset + batch_size]
+        timings = {}
+        call_start = time.perf_counter()
+        results = run_batch_standardization_pipeline(batch, semantic_agent, cache, timings=timings, aliases=aliases)
+        call_latencies.append(time.perf_counter() - call_start)
+        for stage, seconds in timings.items():
+            stage_latencies[stage].append(seconds)
+
+        for result, expected_id in zip(results, truth[offset:offset + batch_size]):
+            statuses[result.get("status")] = statuses.get(result.get("status"), 0) + 1
+            if result.get("action") == "AUTO_CORRECT":
+                auto_corrected += 1
+                if company_ids.get(result.get("best_match")) == expected_id:
+                    correct += 1
+                else:
+                    wrong += 1
+    elapsed = time.perf_counter() - start
+
+    total = len(names)
+    escalated = sum(count for status, count in statuses.items() if status not in ("RESOLVED", "RESOLVED_BY_ALIAS", "REJECTED", None))
+    return {
+        "records": total,
+        "seconds": elapsed,
+        "records_per_second": total / elapsed if elapsed else 0.0,
+        "call_latency_ms": percentiles_ms(call_latencies),
+        "stage_latency_ms": {stage: percentiles_ms(samples) for stage, samples in stage_latencies.items() if samples},
+        "statuses": statuses,
+        "escalation_rate": escalated / total if total else 0.0,
+        # Share of all records auto-corrected to the right company
+        "accuracy": correct / total if total else 0.0,
+        # Share of auto-corrections that picked the wrong company
+        "auto_correct_error_rate": wrong / auto_corrected if auto_corrected else 0.0,
+        "flag_rate": (total - auto_corrected) / total if total else 0.0,
+    }
+
+def print_report(stats: dict) -> None:
+    print(f"\nRecords: {stats['records']} in {stats['seconds']:.1f}s ({stats['records_per_second']:.0f} records/sec)")
+    print(f"Escalation rate: {stats['escalation_rate']:.1%} | Flag rate: {stats['flag_rate']:.1%}")
+    print(f"Accuracy: {stats['accuracy']:.1%} | Wrong auto-corrections: {stats['auto_correct_error_rate']:.2%}")
+    print(f"Statuses: {stats['statuses']}")
+    print("\nLatency per call (ms):")
+    for label, latency in [("total", stats["call_latency_ms"])] + list(stats["stage_latency_ms"].items()):
+        print(f"  {label:<9}" + "  ".join(f"{key}={value:8.2f}" for key, value in latency.items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the standardization pipeline against the CompanyID ground truth.")
+    parser.add_argument("--store", default=os.getenv("RECORD_STORE_PATH", DEFAULT_STORE_PATH), help="Record store holding the canonical company list and learned aliases.")
+    parser.add_argument("--companies", default=None, help="Canonical company list CSV to use instead of the record store.")
+    parser.add_argument("--employees", default=DEFAULT_EMPLOYEES_PATH, help="Submissions with a CompanyID ground truth.")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help="Submissions to run (0 = all).")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Records per pipeline call.")
+    parser.add_argument("--index", default="exact", help="Vector index kind for the semantic agent.")
+    parser.add_argument("--precision", default="int8", help="Storage precision for --index quantized (float16 or int8).")
+    parser.add_argument("--snapshot-dir", default=None, help="Embedding snapshot directory, to skip re-encoding between runs.")
+    parser.add_argument("--with-cache", action="store_true", help="Put an in-memory resolution cache in front of the pipeline.")
+    args = parser.parse_args()
+
+    record_store = RecordStore(args.store)
+    canonical_names, company_ids = load_company_list(record_store, args.companies)
+    # Inputs an admin already approved resolve at stage 0, as they do in the API
+    aliases = AliasTable(record_store.aliases())
+    submissions = pd.read_csv(args.employees, usecols=["SubmittedCompanyName", "CompanyID"], nrows=args.limit or None)
+
+    # The local stub applies the Decision Agent's rules, so runs are offline and repeatable
+    stub_model = decision_agent.LocalStubModel()
+    decision_agent.configure_batcher(model=stub_model)
+
+    build_start = time.perf_counter()
+    index_options = {"precision": args.precision} if args.index == "quantized" else {}
+    semantic_agent = SemanticSearchAgent(canonical_names=canonical_names,
+                                         index_kind=args.index, snapshot_dir=args.snapshot_dir, **index_options)
+    print(f"Agent ready in {time.perf_counter() - build_start:.1f}s for {len(canonical_names)} companies.")
+    cache = ResolutionCache(canonical_list_version(semantic_agent.canonical_names), path=None) if args.with_cache else None
+
+    # Warm up so model loading is not counted as request latency
+    semantic_agent.model.encode(["warm up"])
+
+    stats = run_benchmark(submissions, semantic_agent, company_ids, args.batch_size, cache, aliases)
+    print_report(stats)
+
+    footprint = semantic_agent.memory_footprint()
+    print(f"\nVector index memory: {footprint['vector_bytes'] / 2**20:.1f} MiB private, "
+          f"{footprint['mmapped_bytes'] / 2**20:.1f} MiB memory-mapped | "
+          f"query cache: {footprint['query_cache_entries']} entries, {footprint['query_cache_bytes'] / 2**20:.1f} MiB")
+    if args.index != "exact":
+        sample = submissions["SubmittedCompanyName"].astype(str).head(ACCURACY_SAMPLE_SIZE).tolist()
+        delta = compare_with_exact(semantic_agent.vector_index, semantic_agent.canonical_embeddings,
+                                   semantic_agent.encode_queries(sample), k=3)
+        print(f"Accuracy vs exact search: {delta}")
+    print(f"LLM stub: {stub_model.calls} calls for {stub_model.cases_seen} cases")
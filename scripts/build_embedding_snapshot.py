@@ -0,0 +1,28 @@
+# scripts/build_embedding_snapshot.py
+import argparse
+import os
+import sys
+
+# Allow `python scripts/build_embedding_snapshot.py` from the project root to import `src`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.embedding_snapshot import DEFAULT_SNAPSHOT_DIR, load_snapshot, save_snapshot
+from src.agents.semantic_agent import MODEL_NAME, SemanticSearchAgent
+from src.core.record_store import RecordStore, DEFAULT_STORE_PATH
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute the canonical embedding snapshot loaded by the API at startup.")
+    parser.add_argument("--store", default=os.getenv("RECORD_STORE_PATH", DEFAULT_STORE_PATH), help="Record store holding the canonical company list.")
+    parser.add_argument("--output-dir", default=DEFAULT_SNAPSHOT_DIR, help="Where to write the embedding matrix and manifest.json.")
+    parser.add_argument("--force", action="store_true", help="Re-encode even if an up-to-date snapshot exists.")
+    args = parser.parse_args()
+
+    canonical_names = RecordStore(args.store).company_names()
+    if not args.force and load_snapshot(args.output_dir, canonical_names, MODEL_NAME) is not None:
+        print(f"Snapshot in '{args.output_dir}' is already up to date.")
+        sys.exit(0)
+
+    # Building the agent without a snapshot directory always encodes from scratch
+    agent = SemanticSearchAgent(canonical_names=canonical_names)
+    save_snapshot(args.output_dir, agent.canonical_embeddings, canonical_names, MODEL_NAME)
+    print(f"Saved {len(canonical_names)} embeddings to '{args.output_dir}'")
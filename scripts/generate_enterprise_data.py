@@ -1,4 +1,5 @@
 # scripts/generate_enterprise_data.py
+import argparse
 import pandas as pd
 from faker import Faker
 import random
@@ -8,6 +9,8 @@ import uuid
 # --- Configuration ---
 NUM_EMPLOYEES_TO_GENERATE = 500
 OUTPUT_DIR = "data"
+CHUNK_SIZE = 100_000   # Employee rows generated and written at a time, so 10M rows fit in memory
+NAME_POOL_SIZE = 2_000 # Distinct Faker values drawn per field; calling Faker per row is too slow at scale
 fake = Faker()
 
 # --- "Source of Truth": Our canonical list of companies ---
@@ -21,71 +24,157 @@ CANONICAL_COMPANIES = [
     {'CompanyID': 2004, 'CompanyName': 'Starlight Media Ltd', 'City': 'Los Angeles', 'State': 'CA', 'Country': 'USA'}
 ]
 
-def generate_dirty_company_name(canonical_name):
+# --- Building blocks for synthetic companies beyond the canonical six ---
+# 72 * 72 * 30 * 8 = ~1.2M distinct names
+NAME_PREFIXES = [
+    "Apex", "Blue", "Bright", "Cedar", "Crystal", "Delta", "Eagle", "Echo", "Ever", "Falcon", "First", "Fusion",
+    "Global", "Golden", "Granite", "Green", "Harbor", "Horizon", "Iron", "Keystone", "Lake", "Liberty", "Lunar", "Maple",
+    "Meridian", "Metro", "Nexus", "North", "Nova", "Oak", "Ocean", "Omega", "Orion", "Pacific", "Peak", "Pine",
+    "Pinnacle", "Pioneer", "Prime", "Pulse", "Quantum", "Quest", "Radiant", "Red", "Ridge", "River", "Rock", "Sage",
+    "Silver", "Sky", "Solar", "Sonic", "Spark", "Star", "Sterling", "Stone", "Summit", "Sun", "Swift", "Terra",
+    "Titan", "Trinity", "True", "Unity", "Urban", "Valley", "Vertex", "Vista", "West", "Wild", "Zen", "Zenith"
+]
+NAME_CORES = [
+    "Arc", "Bay", "Bridge", "Brook", "Castle", "Cloud", "Core", "Crest", "Dale", "Dawn", "Field", "Fire",
+    "Flow", "Forge", "Gate", "Glen", "Grove", "Haven", "Hill", "Hub", "Land", "Light", "Line", "Link",
+    "Logic", "Mark", "Mill", "Mind", "Moon", "Mount", "Net", "Path", "Point", "Port", "Reach", "Rise",
+    "Root", "Scape", "Shore", "Side", "Smith", "Source", "Spring", "Square", "Stream", "Tech", "Tide", "Tower",
+    "Trail", "Tree", "Vale", "View", "Ville", "Wave", "Way", "Well", "Wind", "Wing", "Wood", "Works",
+    "Wright", "Yard", "Bloom", "Bolt", "Craft", "Drive", "Edge", "Frame", "Grid", "Loop", "Nest", "Shift"
+]
+NAME_INDUSTRIES = [
+    "Analytics", "Automotive", "Biotech", "Capital", "Consulting", "Design", "Dynamics", "Energy", "Engineering", "Financial",
+    "Foods", "Health", "Holdings", "Industries", "Insurance", "Logistics", "Manufacturing", "Media", "Networks", "Partners",
+    "Pharma", "Properties", "Resources", "Retail", "Robotics", "Security", "Software", "Solutions", "Systems", "Ventures"
+]
+NAME_SUFFIXES = ["Inc.", "LLC", "Ltd", "Corp.", "Group", "Co.", "Corporation", "International"]
+MAX_SYNTHETIC_COMPANIES = len(NAME_PREFIXES) * len(NAME_CORES) * len(NAME_INDUSTRIES) * len(NAME_SUFFIXES)
+
+def generate_dirty_company_name(canonical_name, rng=random):
     """Creates realistic variations and typos of a given company name."""
     name = canonical_name
-    rand = random.random()
+    rand = rng.random()
 
     # We use if statements instead of elif to allow multiple "errors" to stack.
     if rand < 0.2:  # 20% chance of wrong case
-        name = name.lower() if random.random() < 0.5 else name.upper()
+        name = name.lower() if rng.random() < 0.5 else name.upper()
 
     if rand > 0.3 and rand < 0.5: # 20% chance of removing suffix
-        name = name.replace(" Inc.", "").replace(" LLC", "").replace(" Ltd", "")
+        name = name.replace(" Inc.", "").replace(" LLC", "").replace(" Ltd", "").replace(" Corp.", "").replace(" Co.", "")
 
     if rand > 0.5 and rand < 0.7: # 20% chance of a single character typo
         if len(name) > 4:
-            pos = random.randint(1, len(name) - 2)
-            char_to_replace = name[pos]
-            # Replace with a nearby key on the keyboard or just a random letter
-            name = name[:pos] + random.choice('abcdefghijklmnopqrstuvwxyz') + name[pos+1:]
+            pos = rng.randint(1, len(name) - 2)
+            typo = rng.random()
+            if typo < 0.5:   # Replace with a random letter
+                name = name[:pos] + rng.choice('abcdefghijklmnopqrstuvwxyz') + name[pos+1:]
+            elif typo < 0.75: # Drop a character
+                name = name[:pos] + name[pos+1:]
+            else:            # Swap two neighbouring characters
+                name = name[:pos] + name[pos+1] + name[pos] + name[pos+2:]
 
     if rand > 0.7 and rand < 0.9: # 20% chance of abbreviation
-         name = name.replace("Group", "Grp").replace("Solutions", "Sol.")
+         name = name.replace("Group", "Grp").replace("Solutions", "Sol.").replace("Corporation", "Corp").replace("International", "Intl")
+
+    if rng.random() < 0.05: # 5% chance of stray whitespace, on top of any other error
+        name = "  ".join(name.split()) + " "
 
     # ~20% chance of being entered correctly
     return name
 
-def generate_employees_data(companies_list):
-    """Generates synthetic employee data with 'dirty' company name inputs."""
-    employee_data = []
-    for _ in range(NUM_EMPLOYEES_TO_GENERATE):
-        # Pick a random company from our correct list
-        correct_company = random.choice(companies_list)
-
-        # Simulate a user typing the company name, possibly with errors
-        submitted_name = generate_dirty_company_name(correct_company['CompanyName'])
-
-        employee_data.append({
-            "EmployeeID": str(uuid.uuid4()),
-            "FirstName": fake.first_name(),
-            "LastName": fake.last_name(),
-            "Email": fake.email(),
-            "Title": fake.job(),
-            "CompanyID": correct_company['CompanyID'], # The correct foreign key
-            "SubmittedCompanyName": submitted_name, # The text that needs standardization
+def generate_companies_data(num_companies, rng=random):
+    """
+    Builds a canonical list of `num_companies` companies: the six real ones
+    first, then distinct synthetic names drawn without replacement.
+    """
+    companies_list = CANONICAL_COMPANIES[:num_companies]
+    extra = max(0, num_companies - len(companies_list))
+    if extra > MAX_SYNTHETIC_COMPANIES:
+        raise ValueError(f"Can generate at most {MAX_SYNTHETIC_COMPANIES + len(CANONICAL_COMPANIES)} companies.")
+
+    places = [(fake.city(), fake.state_abbr()) for _ in range(min(extra, NAME_POOL_SIZE))]
+    next_id = max(company['CompanyID'] for company in CANONICAL_COMPANIES) + 1
+    for offset, combination in enumerate(rng.sample(range(MAX_SYNTHETIC_COMPANIES), extra)):
+        combination, suffix = divmod(combination, len(NAME_SUFFIXES))
+        combination, industry = divmod(combination, len(NAME_INDUSTRIES))
+        prefix, core = divmod(combination, len(NAME_CORES))
+        city, state = rng.choice(places)
+        companies_list.append({
+            'CompanyID': next_id + offset,
+            'CompanyName': f"{NAME_PREFIXES[prefix]}{NAME_CORES[core].lower()} {NAME_INDUSTRIES[industry]} {NAME_SUFFIXES[suffix]}",
+            'City': city, 'State': state, 'Country': 'USA'
         })
 
-    print(f"Generated {len(employee_data)} employee records.")
-    return pd.DataFrame(employee_data)
+    print(f"Generated {len(companies_list)} company records.")
+    return pd.DataFrame(companies_list)
+
+def generate_employees_data(companies_list, num_employees=NUM_EMPLOYEES_TO_GENERATE, rng=random, skew=0.0):
+    """
+    Generates synthetic employee data with 'dirty' company name inputs,
+    yielding DataFrames of at most CHUNK_SIZE rows. With `skew` > 0, company
+    popularity follows a Zipf law, so a few companies get most submissions.
+    """
+    first_names = [fake.first_name() for _ in range(NAME_POOL_SIZE)]
+    last_names = [fake.last_name() for _ in range(NAME_POOL_SIZE)]
+    titles = [fake.job() for _ in range(NAME_POOL_SIZE)]
+    cum_weights = None
+    if skew > 0:
+        cum_weights, total = [], 0.0
+        for rank in range(1, len(companies_list) + 1):
+            total += rank ** -skew
+            cum_weights.append(total)
+
+    generated = 0
+    while generated < num_employees:
+        size = min(CHUNK_SIZE, num_employees - generated)
+        employee_data = []
+        # Pick a random company from our correct list
+        for correct_company in rng.choices(companies_list, cum_weights=cum_weights, k=size):
+            first_name, last_name = rng.choice(first_names), rng.choice(last_names)
+            employee_data.append({
+                "EmployeeID": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "FirstName": first_name,
+                "LastName": last_name,
+                "Email": f"{first_name.lower()}.{last_name.lower()}{rng.randint(1, 9999)}@example.com",
+                "Title": rng.choice(titles),
+                "CompanyID": correct_company['CompanyID'], # The correct foreign key
+                # Simulate a user typing the company name, possibly with errors
+                "SubmittedCompanyName": generate_dirty_company_name(correct_company['CompanyName'], rng),
+            })
+        generated += size
+        print(f"Generated {generated} employee records.")
+        yield pd.DataFrame(employee_data)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic canonical company list and dirty employee submissions.")
+    parser.add_argument("--companies", type=int, default=len(CANONICAL_COMPANIES), help="Number of canonical companies.")
+    parser.add_argument("--employees", type=int, default=NUM_EMPLOYEES_TO_GENERATE, help="Number of employee submissions.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for a reproducible dataset.")
+    parser.add_argument("--skew", type=float, default=0.0, help="Zipf exponent for company popularity (0 = uniform).")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help="Where to write the CSV files.")
+    args = parser.parse_args()
+    if args.companies < 1:
+        parser.error("--companies must be at least 1.")
+
     print("Starting synthetic data generation based on enterprise schema...")
+    rng = random.Random(args.seed)
+    Faker.seed(args.seed)
 
     # Ensure the output directory exists
-    if not os.path.exists(OUTPUT_DIR):
-        os.makedirs(OUTPUT_DIR)
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
 
     # 1. Create and save the canonical companies DataFrame
-    companies_df = pd.DataFrame(CANONICAL_COMPANIES)
-    companies_path = os.path.join(OUTPUT_DIR, "enterprise_companies.csv")
+    companies_df = generate_companies_data(args.companies, rng)
+    companies_path = os.path.join(args.output_dir, "enterprise_companies.csv")
     companies_df.to_csv(companies_path, index=False)
     print(f"Canonical company list saved to '{companies_path}'")
 
-    # 2. Generate and save the employees DataFrame with dirty data
-    employees_df = generate_employees_data(CANONICAL_COMPANIES)
-    employees_path = os.path.join(OUTPUT_DIR, "enterprise_employees.csv")
-    employees_df.to_csv(employees_path, index=False)
+    # 2. Generate and save the employees DataFrame with dirty data, one chunk at a time
+    employees_path = os.path.join(args.output_dir, "enterprise_employees.csv")
+    companies_list = companies_df.to_dict("records")
+    for chunk_number, employees_df in enumerate(generate_employees_data(companies_list, args.employees, rng, args.skew)):
+        employees_df.to_csv(employees_path, mode="w" if chunk_number == 0 else "a", header=chunk_number == 0, index=False)
     print(f"Synthetic employee data saved to '{employees_path}'")
 
-    print("\nData generation complete.")
\ No newline at end of file
+    print("\nData generation complete.")
@@ -0,0 +1,29 @@
+# scripts/manage_records.py
+import argparse
+import os
+import sys
+
+# Allow `python scripts/manage_records.py` from the project root to import `src`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.record_store import RecordStore, DEFAULT_STORE_PATH, DEFAULT_COMPANIES_CSV, DEFAULT_EMPLOYEES_CSV
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import the companies and employees CSV files into the record store, or export them.")
+    parser.add_argument("action", choices=["import", "export"], help="import: CSV files -> store; export: store -> CSV files.")
+    parser.add_argument("--store", default=os.getenv("RECORD_STORE_PATH", DEFAULT_STORE_PATH), help="Record store to read or update.")
+    parser.add_argument("--companies", default=DEFAULT_COMPANIES_CSV, help="Companies CSV file.")
+    parser.add_argument("--employees", default=DEFAULT_EMPLOYEES_CSV, help="Employees CSV file.")
+    parser.add_argument("--replace", action="store_true",
+                        help="With import: empty both tables first (drops records saved since the last import) instead of only adding new IDs.")
+    args = parser.parse_args()
+
+    # Opened without CSV files so the store is not seeded as a side effect
+    record_store = RecordStore(args.store, companies_csv=None, employees_csv=None)
+    if args.action == "import":
+        if not os.path.exists(args.companies):
+            parser.error(f"'{args.companies}' not found.")
+        record_store.import_csv(args.companies, args.employees, replace=args.replace)
+    else:
+        record_store.export_csv(args.companies, args.employees)
+        print(f"Exported {record_store.company_count()} companies to '{args.companies}' and the employees to '{args.employees}'.")
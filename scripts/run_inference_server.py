@@ -0,0 +1,40 @@
+# scripts/run_inference_server.py
+import argparse
+import os
+import sys
+
+# Allow `python scripts/run_inference_server.py` from the project root to import `src`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.embedding_snapshot import DEFAULT_SNAPSHOT_DIR
+from src.agents.semantic_agent import SemanticSearchAgent
+from src.core.record_store import RecordStore, DEFAULT_STORE_PATH
+from src.core.inference_server import (
+    InferenceServer, DEFAULT_ADDRESS, MAX_BATCH_SIZE, MAX_BATCH_WAIT_SECONDS, INFERENCE_WORKERS
+)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve encode and vector search for every API worker on this node.")
+    parser.add_argument("--store", default=os.getenv("RECORD_STORE_PATH", DEFAULT_STORE_PATH), help="Record store holding the canonical company list.")
+    parser.add_argument("--snapshot-dir", default=os.getenv("EMBEDDING_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR),
+                        help="Embedding snapshot to memory-map (built if missing or stale).")
+    parser.add_argument("--address", default=os.getenv("INFERENCE_SERVER_ADDRESS", DEFAULT_ADDRESS),
+                        help="Unix socket path (only this user can connect), or host:port.")
+    parser.add_argument("--index", default=os.getenv("VECTOR_INDEX", "exact"), help="Vector index kind.")
+    parser.add_argument("--precision", default=os.getenv("VECTOR_INDEX_PRECISION", "int8"), help="Storage precision for --index quantized.")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE, help="Inputs encoded together in one model call.")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_BATCH_WAIT_SECONDS * 1000, help="How long a batch waits to fill.")
+    parser.add_argument("--workers", type=int, default=INFERENCE_WORKERS, help="Batches in flight at once.")
+    args = parser.parse_args()
+
+    canonical_names = RecordStore(args.store).company_names()
+    index_options = {"precision": args.precision} if args.index == "quantized" else {}
+    agent = SemanticSearchAgent(canonical_names=canonical_names, snapshot_dir=args.snapshot_dir,
+                                index_kind=args.index, **index_options)
+    # Load the model now rather than on the first request
+    agent.model.encode(["warm up"])
+
+    server = InferenceServer(agent, max_batch_size=args.max_batch_size,
+                             max_wait_seconds=args.max_wait_ms / 1000.0, workers=args.workers)
+    # The key comes from INFERENCE_SERVER_AUTHKEY, or a random one is written next to the data on first start
+    server.serve_forever(args.address)
@@ -0,0 +1,102 @@
+# scripts/standardize_csv.py
+import argparse
+import os
+import sys
+import time
+import pandas as pd
+
+# Allow `python scripts/standardize_csv.py` from the project root to import `src`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.agents.alias_table import AliasTable
+from src.agents.semantic_agent import SemanticSearchAgent
+from src.core.orchestrator import run_batch_standardization_pipeline, ESCALATED_STATUSES
+from src.core.record_store import RecordStore, DEFAULT_STORE_PATH, load_company_list
+
+# --- Configuration ---
+DEFAULT_INPUT_PATH = "data/enterprise_employees.csv"
+DEFAULT_OUTPUT_PATH = "data/enterprise_employees_standardized.csv"
+DEFAULT_REVIEW_QUEUE_PATH = "data/review_queue.csv"
+DEFAULT_CHUNK_SIZE = 10_000
+NAME_COLUMN = "SubmittedCompanyName"
+RESOLVED_ID_COLUMN = "ResolvedCompanyID"
+
+def standardize_chunk(chunk: pd.DataFrame, semantic_agent: SemanticSearchAgent, company_ids: dict,
+                      aliases: AliasTable = None):
+    """
+    Resolves one chunk of rows. Each distinct submitted name is run through
+    the pipeline once, then the verdicts are mapped back onto every row.
+    Returns the annotated chunk, a mask of flagged rows and the number of
+    rows that were escalated to the specialist agents.
+    """
+    submitted = chunk[NAME_COLUMN].fillna("").astype(str)
+    unique_names = submitted.unique().tolist()
+    results = run_batch_standardization_pipeline(unique_names, semantic_agent, aliases=aliases)
+
+    verdicts = {}
+    for name, result in zip(unique_names, results):
+        auto_corrected = result.get("action") == "AUTO_CORRECT" and result.get("best_match") in company_ids
+        verdicts[name] = {
+            RESOLVED_ID_COLUMN: company_ids[result["best_match"]] if auto_corrected else None,
+            "ResolutionAction": "AUTO_CORRECT" if auto_corrected else "FLAG_FOR_REVIEW",
+            "ResolutionReason": result.get("reason"),
+            "Escalated": result.get("status") in ESCALATED_STATUSES,
+        }
+
+    chunk = chunk.copy()
+    for column in (RESOLVED_ID_COLUMN, "ResolutionAction", "ResolutionReason"):
+        chunk[column] = submitted.map(lambda name: verdicts[name][column])
+    chunk[RESOLVED_ID_COLUMN] = chunk[RESOLVED_ID_COLUMN].astype("Int64")
+    flagged = chunk["ResolutionAction"] == "FLAG_FOR_REVIEW"
+    escalated_rows = int(submitted.map(lambda name: verdicts[name]["Escalated"]).sum())
+    return chunk, flagged, escalated_rows
+
+def standardize_csv(input_path: str, output_path: str, review_queue_path: str,
+                    semantic_agent: SemanticSearchAgent, company_ids: dict, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    aliases: AliasTable = None) -> dict:
+    """Streams the input CSV in chunks so memory stays bounded regardless of file size."""
+    total_rows = flagged_rows = escalated_rows = 0
+    start = time.perf_counter()
+
+    for chunk_number, chunk in enumerate(pd.read_csv(input_path, chunksize=chunk_size)):
+        resolved_chunk, flagged, chunk_escalated = standardize_chunk(chunk, semantic_agent, company_ids, aliases)
+        first_chunk = chunk_number == 0
+        resolved_chunk.to_csv(output_path, mode="w" if first_chunk else "a", header=first_chunk, index=False)
+        resolved_chunk[flagged].to_csv(review_queue_path, mode="w" if first_chunk else "a", header=first_chunk, index=False)
+
+        total_rows += len(resolved_chunk)
+        flagged_rows += int(flagged.sum())
+        escalated_rows += chunk_escalated
+        print(f"Processed {total_rows} rows...")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": total_rows,
+        "flagged_rows": flagged_rows,
+        "escalated_rows": escalated_rows,
+        "seconds": elapsed,
+        "rows_per_second": total_rows / elapsed if elapsed else 0.0,
+        "escalation_rate": escalated_rows / total_rows if total_rows else 0.0,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Standardize the SubmittedCompanyName column of a CSV file.")
+    parser.add_argument("--input", default=DEFAULT_INPUT_PATH, help="CSV file with a SubmittedCompanyName column.")
+    parser.add_argument("--store", default=os.getenv("RECORD_STORE_PATH", DEFAULT_STORE_PATH), help="Record store holding the canonical company list and learned aliases.")
+    parser.add_argument("--companies", default=None, help="Canonical company list CSV to use instead of the record store.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH, help="Where to write the resolved rows.")
+    parser.add_argument("--review-queue", default=DEFAULT_REVIEW_QUEUE_PATH, help="Where to write flagged rows.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read per chunk.")
+    args = parser.parse_args()
+
+    record_store = RecordStore(args.store)
+    canonical_names, company_ids = load_company_list(record_store, args.companies)
+    # Inputs an admin already approved resolve at stage 0, as they do in the API
+    aliases = AliasTable(record_store.aliases())
+    semantic_agent = SemanticSearchAgent(canonical_names=canonical_names)
+
+    stats = standardize_csv(args.input, args.output, args.review_queue, semantic_agent, company_ids, args.chunk_size, aliases)
+
+    print(f"\nStandardized {stats['rows']} rows in {stats['seconds']:.1f}s ({stats['rows_per_second']:.0f} rows/sec).")
+    print(f"Escalation rate: {stats['escalation_rate']:.1%} | Flagged for review: {stats['flagged_rows']} rows")
+    print(f"Resolved rows saved to '{args.output}', review queue saved to '{args.review_queue}'")
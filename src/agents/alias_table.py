@@ -0,0 +1,108 @@
+# src/agents/alias_table.py
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Trailing legal-form tokens that do not tell two companies apart
+LEGAL_SUFFIXES = {"inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation", "co", "company", "plc", "lp", "llp"}
+# Common abbreviations, expanded so "Apex Financial Grp" and "Apex Financial Group" share a key
+ABBREVIATIONS = {"grp": "group", "sol": "solutions", "intl": "international", "&": "and"}
+_TOKEN = re.compile(r"\w+|&")
+
+def canonical_key(name: str) -> str:
+    """
+    Normalized form used for exact lookups: casefolded, punctuation dropped,
+    abbreviations expanded and trailing legal suffixes (Inc., LLC, Ltd...)
+    stripped. A name made only of suffixes keeps them, so it still has a key.
+    """
+    tokens = [ABBREVIATIONS.get(token, token) for token in _TOKEN.findall(name.casefold())]
+    end = len(tokens)
+    while end > 1 and tokens[end - 1] in LEGAL_SUFFIXES:
+        end -= 1
+    return " ".join(tokens[:end])
+
+class NormalizedNameIndex:
+    """
+    Hash index from canonical_key() to the canonical names that produce it,
+    built with the rest of a CanonicalState. An input whose key belongs to
+    exactly one canonical name is resolved by a dict lookup, before any
+    similarity scoring; keys shared by several names (e.g. "Acme Inc." and
+    "Acme LLC") are ambiguous and left to the agents.
+    """
+
+    def __init__(self, canonical_names: List[str]):
+        self.canonical_names = canonical_names
+        self._names_by_key: Dict[str, Tuple[str, ...]] = {}
+        self._index(canonical_names)
+
+    def _index(self, names: Sequence[str]) -> None:
+        for name in names:
+            key = canonical_key(name)
+            known = self._names_by_key.get(key, ())
+            if name not in known:
+                self._names_by_key[key] = known + (name,)
+
+    def lookup(self, user_input: str) -> Optional[str]:
+        """The canonical name the input normalizes to, or None when there is none or it is ambiguous."""
+        key = canonical_key(user_input)
+        names = self._names_by_key.get(key, ()) if key else ()
+        return names[0] if len(names) == 1 else None
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names_by_key.get(canonical_key(name), ())
+
+    def add(self, names: List[str]) -> "NormalizedNameIndex":
+        """Returns a new index with `names` appended; this one is left untouched."""
+        index = NormalizedNameIndex.__new__(NormalizedNameIndex)
+        index.canonical_names = self.canonical_names + list(names)
+        index._names_by_key = dict(self._names_by_key)
+        index._index(names)
+        return index
+
+    def remove(self, positions: Sequence[int]) -> "NormalizedNameIndex":
+        """Returns a new index without the names at `positions` (every occurrence of those names)."""
+        removed = {self.canonical_names[idx] for idx in positions}
+        index = NormalizedNameIndex.__new__(NormalizedNameIndex)
+        index.canonical_names = [name for name in self.canonical_names if name not in removed]
+        index._names_by_key = dict(self._names_by_key)
+        for key in {canonical_key(name) for name in removed}:
+            remaining = tuple(name for name in index._names_by_key[key] if name not in removed)
+            if remaining:
+                index._names_by_key[key] = remaining
+            else:
+                del index._names_by_key[key]
+        return index
+
+class AliasTable:
+    """
+    Aliases learned from admin approvals (e.g. "Rodes cures cat" -> "Rod Cute
+    Cats"), keyed on canonical_key() so every case and suffix variant of an
+    approved input hits too. Lookups are one dict access; an alias whose
+    target has since left the canonical list is ignored.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, str]] = None):
+        self._aliases: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.replace(aliases or {})
+
+    def replace(self, aliases: Dict[str, str]) -> None:
+        """Swaps in a fresh set of aliases (e.g. re-read from the record store)."""
+        table = {canonical_key(alias): canonical_name for alias, canonical_name in aliases.items()}
+        with self._lock:
+            self._aliases = table
+
+    def add(self, alias: str, canonical_name: str) -> None:
+        """Learns one alias (e.g. right after an admin approves a suggestion)."""
+        with self._lock:
+            self._aliases[canonical_key(alias)] = canonical_name
+
+    def lookup(self, user_input: str, name_index: NormalizedNameIndex) -> Optional[str]:
+        """The canonical name the input is a known alias of, if that name is still on the list."""
+        canonical_name = self._aliases.get(canonical_key(user_input))
+        if canonical_name is None or canonical_name not in name_index:
+            return None
+        return canonical_name
+
+    def __len__(self) -> int:
+        return len(self._aliases)
@@ -1,51 +1,296 @@
 # src/agents/decision_agent.py
 import os
 import json
-import google.generativeai as genai
+import asyncio
+import math
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from types import SimpleNamespace
 from dotenv import load_dotenv
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+from src.core.metrics import METRICS, record_stage
 
 load_dotenv()
 
-def get_final_decision(dossier: Dict) -> Dict:
-    """
-    Makes a final decision using Google's Gemini model with improved rules.
-    """
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        print("Warning: GOOGLE_API_KEY not found. Decision agent is offline.")
-        return {"action": "FLAG_FOR_REVIEW", "reasoning": "Gemini agent is not configured."}
+MODEL_NAME = "gemini-1.5-flash-latest"
+GENERATION_CONFIG = {"temperature": 0.0, "response_mime_type": "application/json"}
+SCORE_BUCKET = 0.01           # Scores within the same 0.01 bucket share a memoized verdict
+MEMO_SIZE = 4096              # Verdicts kept in the memo cache
+MAX_BATCH_SIZE = 16           # Escalations sent to the LLM in a single prompt
+MAX_BATCH_WAIT_SECONDS = 0.0  # Extra time to wait for a batch to fill (0 = only take what is already queued)
+BATCH_WORKERS = 4             # LLM calls allowed in flight at once
+DECISION_TIMEOUT_SECONDS = 15.0  # Per Gemini request, and how long a caller waits for a verdict
 
-    try:
-        genai.configure(api_key=api_key)
-        
-        # --- DEFINITIVE PROMPT ---
-        prompt = f"""
-        You are a decisive data quality analyst. Your task is to make a final data standardization decision based on a dossier of evidence. Your bias is towards action, trusting the consensus of your specialist agents.
+_model = None
+_model_lock = threading.Lock()
+_memo: "OrderedDict[Tuple, Dict]" = OrderedDict()
+_memo_lock = threading.Lock()
+_batcher_lock = threading.Lock()
+
+def get_model():
+    """Returns the shared Gemini client, configuring it once. None when no API key is set."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                api_key = os.getenv("GOOGLE_API_KEY")
+                if not api_key:
+                    return None
+                # Imported lazily: the SDK is slow to import and only needed for escalations
+                import google.generativeai as genai
+                genai.configure(api_key=api_key)
+                _model = genai.GenerativeModel(model_name=MODEL_NAME, generation_config=GENERATION_CONFIG)
+    return _model
 
-        **Case Dossier:**
-        - User Input: "{dossier.get('user_input')}"
-        - Lexical Agent Suggestion: "{dossier.get('best_match_lexical')}" (Score: {dossier.get('score_lexical'):.2f})
-        - Semantic Agent Suggestion: "{dossier.get('best_match_semantic')}" (Score: {dossier.get('score_semantic'):.2f})
+def _memo_key(dossier: Dict) -> Tuple:
+    """The verdict only depends on the field, the two suggestions and (roughly) their scores."""
+    return (
+        dossier.get("field", "company"),
+        dossier.get("best_match_lexical"),
+        dossier.get("best_match_semantic"),
+        math.floor((dossier.get("score_lexical") or 0.0) / SCORE_BUCKET),
+        math.floor((dossier.get("score_semantic") or 0.0) / SCORE_BUCKET),
+    )
+
+def _memo_get(dossier: Dict) -> Optional[Dict]:
+    with _memo_lock:
+        key = _memo_key(dossier)
+        if key in _memo:
+            _memo.move_to_end(key)
+            return dict(_memo[key])
+    return None
+
+def _memo_put(dossier: Dict, decision: Dict) -> None:
+    with _memo_lock:
+        _memo[_memo_key(dossier)] = dict(decision)
+        if len(_memo) > MEMO_SIZE:
+            _memo.popitem(last=False)
+
+def build_prompt(dossiers: List[Dict]) -> str:
+    """Builds one prompt asking for a verdict on every case in the list."""
+    cases = [
+        {
+            "case_id": case_id,
+            "field": dossier.get("field", "company"),
+            "user_input": dossier.get("user_input"),
+            "lexical_suggestion": dossier.get("best_match_lexical"),
+            "lexical_score": round(dossier.get("score_lexical") or 0.0, 2),
+            "semantic_suggestion": dossier.get("best_match_semantic"),
+            "semantic_score": round(dossier.get("score_semantic") or 0.0, 2),
+        }
+        for case_id, dossier in enumerate(dossiers)
+    ]
+    # --- DEFINITIVE PROMPT ---
+    return f"""
+        You are a decisive data quality analyst. Your task is to make final data standardization decisions based on dossiers of evidence. Your bias is towards action, trusting the consensus of your specialist agents.
+
+        **Case Dossiers (JSON):**
+        <cases>{json.dumps(cases)}</cases>
 
         **Decision Rules:**
-        1.  **Rule of Consensus:** If the Lexical Agent and the Semantic Agent suggest the EXACT SAME company, you have very strong evidence. In this case, you MUST "AUTO_CORRECT". This is the most important rule.
+        1.  **Rule of Consensus:** If the Lexical Agent and the Semantic Agent suggest the EXACT SAME value, you have very strong evidence. In this case, you MUST "AUTO_CORRECT". This is the most important rule.
         2.  **Rule of High Confidence:** If either agent has a score above 0.96, you can trust it and "AUTO_CORRECT".
-        3.  **Rule of Doubt:** If the agents suggest DIFFERENT companies and their scores are not high, then "FLAG_FOR_REVIEW".
+        3.  **Rule of Doubt:** If the agents suggest DIFFERENT values and their scores are not high, then "FLAG_FOR_REVIEW".
 
         **Your Task:**
-        Apply the rules to the dossier and provide your final verdict.
+        Apply the rules to every dossier independently and provide your final verdicts.
 
         **Response Format:**
-        Respond with a single, minified JSON object with three keys: "action" (string), "corrected_name" (string, or null), and "reasoning" (a brief, one-sentence explanation applying the rules).
+        Respond with a single, minified JSON array with one object per case, in the same order. Each object has four keys: "case_id" (integer), "action" (string), "corrected_name" (string, or null), and "reasoning" (a brief, one-sentence explanation applying the rules).
         """
 
-        generation_config = {"temperature": 0.0, "response_mime_type": "application/json"}
-        model = genai.GenerativeModel(model_name="gemini-1.5-flash-latest", generation_config=generation_config)
-        response = model.generate_content(prompt)
-        decision_str = response.text
-        return json.loads(decision_str)
+def _parse_verdicts(text: str, n_cases: int) -> List[Dict]:
+    """Parses the model's JSON array and lines the verdicts up with the cases."""
+    verdicts = json.loads(text)
+    if isinstance(verdicts, dict):
+        verdicts = [verdicts]
+    if len(verdicts) != n_cases:
+        raise ValueError(f"Expected {n_cases} verdicts, got {len(verdicts)}")
+    by_case = {verdict.get("case_id"): verdict for verdict in verdicts}
+    ordered = [by_case.get(case_id) for case_id in range(n_cases)]
+    if any(verdict is None for verdict in ordered):
+        ordered = verdicts # No usable case ids: trust the order
+    return [
+        {"action": v.get("action"), "corrected_name": v.get("corrected_name"), "reasoning": v.get("reasoning")}
+        for v in ordered
+    ]
+
+def get_final_decisions(dossiers: List[Dict], model=None) -> List[Dict]:
+    """
+    Decides several dossiers with at most one LLM call. Memoized verdicts
+    are reused; `model` can be any object with a Gemini-style
+    `generate_content(prompt, request_options)` (e.g. LocalStubModel for offline runs).
+    """
+    decisions: List[Optional[Dict]] = [_memo_get(dossier) for dossier in dossiers]
+    pending = [i for i, decision in enumerate(decisions) if decision is None]
+    METRICS.increment("llm_memo_hits", len(dossiers) - len(pending))
+    if not pending:
+        return decisions
+
+    model = model or get_model()
+    if model is None:
+        print("Warning: GOOGLE_API_KEY not found. Decision agent is offline.")
+        METRICS.increment("errors", len(pending), kind="llm_offline")
+        for i in pending:
+            decisions[i] = {"action": "FLAG_FOR_REVIEW", "reasoning": "Gemini agent is not configured.", "fallback": True}
+        return decisions
 
+    try:
+        start = time.perf_counter()
+        METRICS.increment("llm_calls")
+        # Bounded so a hung request cannot hold a batcher worker (and every escalation queued behind it)
+        response = model.generate_content(build_prompt([dossiers[i] for i in pending]),
+                                          request_options={"timeout": DECISION_TIMEOUT_SECONDS})
+        record_stage(None, "llm", start)
+        for i, decision in zip(pending, _parse_verdicts(response.text, len(pending))):
+            _memo_put(dossiers[i], decision)
+            decisions[i] = decision
     except Exception as e:
         print(f"Error calling Gemini API: {e}")
-        return {"action": "FLAG_FOR_REVIEW", "reasoning": f"An error occurred in the Gemini agent: {e}"}
\ No newline at end of file
+        METRICS.increment("errors", len(pending), kind="llm_error")
+        for i in pending:
+            decisions[i] = {"action": "FLAG_FOR_REVIEW", "reasoning": f"An error occurred in the Gemini agent: {e}", "fallback": True}
+    return decisions
+
+def get_final_decision(dossier: Dict, model=None) -> Dict:
+    """
+    Makes a final decision using Google's Gemini model with improved rules.
+    """
+    return get_final_decisions([dossier], model)[0]
+
+async def get_final_decision_async(dossier: Dict, timeout: float = DECISION_TIMEOUT_SECONDS) -> Dict:
+    """
+    Awaits a verdict from the shared micro-batcher without blocking the event
+    loop. The batcher's workers cap how many LLM calls are in flight; a
+    verdict that takes longer than `timeout` falls back to FLAG_FOR_REVIEW.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(get_batcher().submit(dossier)), timeout)
+    except asyncio.TimeoutError:
+        return _timeout_decision(timeout)
+
+def wait_for_decisions(futures: List[Future], timeout: float = DECISION_TIMEOUT_SECONDS) -> List[Dict]:
+    """
+    Blocking counterpart of get_final_decision_async for futures from the
+    batcher: each gets until `timeout` after this call, then is cancelled
+    and falls back to FLAG_FOR_REVIEW.
+    """
+    deadline = time.monotonic() + timeout
+    decisions = []
+    for future in futures:
+        try:
+            decisions.append(future.result(max(0.0, deadline - time.monotonic())))
+        except FutureTimeoutError:
+            future.cancel()
+            decisions.append(_timeout_decision(timeout))
+    return decisions
+
+def _timeout_decision(timeout: float) -> Dict:
+    print(f"Warning: Gemini agent timed out after {timeout:.0f}s.")
+    METRICS.increment("errors", kind="llm_timeout")
+    return {"action": "FLAG_FOR_REVIEW", "reasoning": f"The Gemini agent did not answer within {timeout:.0f}s.", "fallback": True}
+
+class LocalStubModel:
+    """
+    Offline stand-in for Gemini that applies the prompt's decision rules
+    itself. Records how many prompts and cases it received, which makes
+    batching behaviour easy to check without network access.
+    """
+
+    def __init__(self, high_confidence: float = 0.96):
+        self.high_confidence = high_confidence
+        self.calls = 0
+        self.cases_seen = 0
+
+    def generate_content(self, prompt: str, request_options: Optional[Dict] = None):
+        cases = json.loads(prompt.split("<cases>", 1)[1].split("</cases>", 1)[0])
+        self.calls += 1
+        self.cases_seen += len(cases)
+        verdicts = []
+        for case in cases:
+            lexical, semantic = case["lexical_suggestion"], case["semantic_suggestion"]
+            best = lexical if case["lexical_score"] >= case["semantic_score"] else semantic
+            if lexical == semantic:
+                verdict = ("AUTO_CORRECT", lexical, "Rule of Consensus: both agents agree.")
+            elif max(case["lexical_score"], case["semantic_score"]) > self.high_confidence:
+                verdict = ("AUTO_CORRECT", best, "Rule of High Confidence: a score is above the threshold.")
+            else:
+                verdict = ("FLAG_FOR_REVIEW", None, "Rule of Doubt: the agents disagree with low scores.")
+            verdicts.append({"case_id": case["case_id"], "action": verdict[0], "corrected_name": verdict[1], "reasoning": verdict[2]})
+        return SimpleNamespace(text=json.dumps(verdicts))
+
+class DecisionBatcher:
+    """
+    Micro-batcher for concurrent escalations. Callers submit dossiers from
+    any thread; each worker takes everything already queued (up to
+    `max_batch_size`) and resolves it with a single prompt, so batches
+    form naturally while earlier LLM calls are in flight.
+    """
+
+    def __init__(self, model=None, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_seconds: float = MAX_BATCH_WAIT_SECONDS, workers: int = BATCH_WORKERS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.batches_sent = 0
+        self._queue: "queue.Queue[Tuple[Dict, Future]]" = queue.Queue()
+        for _ in range(workers):
+            threading.Thread(target=self._work, daemon=True).start()
+
+    def submit(self, dossier: Dict) -> Future:
+        """Queues a dossier and returns a future for its decision."""
+        future: Future = Future()
+        self._queue.put((dossier, future))
+        return future
+
+    def decide(self, dossier: Dict) -> Dict:
+        """Blocking helper: submit a dossier and wait for its decision."""
+        return self.submit(dossier).result()
+
+    def _next_batch(self) -> List[Tuple[Dict, Future]]:
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get(timeout=self.max_wait_seconds) if self.max_wait_seconds else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self) -> None:
+        while True:
+            # Callers that already gave up (e.g. an async request that timed out) cancelled their
+            # future; drop those, and mark the rest running so they can no longer be cancelled
+            batch = [(dossier, future) for dossier, future in self._next_batch() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                decisions = get_final_decisions([dossier for dossier, _ in batch], self.model)
+                self.batches_sent += 1
+                for (_, future), decision in zip(batch, decisions):
+                    future.set_result(decision)
+            except Exception as e:
+                # Whatever one batch throws, this worker keeps serving the queue
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+_batcher: Optional[DecisionBatcher] = None
+
+def get_batcher() -> DecisionBatcher:
+    """Returns the process-wide micro-batcher used by the orchestrator."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = DecisionBatcher()
+    return _batcher
+
+def configure_batcher(model=None, **options) -> DecisionBatcher:
+    """Replaces the process-wide micro-batcher, e.g. to run against LocalStubModel offline."""
+    global _batcher
+    with _batcher_lock:
+        _batcher = DecisionBatcher(model=model, **options)
+    return _batcher
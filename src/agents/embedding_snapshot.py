@@ -0,0 +1,134 @@
+# src/agents/embedding_snapshot.py
+import glob
+import json
+import os
+import tempfile
+import numpy as np
+from typing import List, Optional, Tuple
+from src.core.resolution_cache import canonical_list_version
+
+DEFAULT_SNAPSHOT_DIR = "data/embeddings"
+EMBEDDINGS_FILE = "embeddings-{version}.npy"  # Main matrix, named after the list version of its rows
+DELTA_FILE = "delta-{version}.npy"            # Rows appended since, named after the version of the whole list
+MANIFEST_FILE = "manifest.json"
+
+def _write_atomically(path: str, write) -> None:
+    """
+    Writes through a uniquely named temporary file in the same directory,
+    then renames it over `path`, so a crash or another process writing the
+    same snapshot never leaves (or reads) a half-written file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def _read_manifest(directory: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    """Points the snapshot at its (already written) matrix files, then deletes files it no longer uses."""
+    _write_atomically(os.path.join(directory, MANIFEST_FILE), lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    in_use = {manifest["embeddings_file"], manifest["delta_file"]}
+    for pattern in (EMBEDDINGS_FILE, DELTA_FILE):
+        for path in glob.glob(os.path.join(directory, pattern.format(version="*"))):
+            if os.path.basename(path) not in in_use:
+                try:
+                    os.unlink(path) # Processes that mapped it keep their pages until they let go
+                except OSError:
+                    pass
+
+def _save_delta(directory: str, delta: np.ndarray, canonical_names: List[str]) -> Optional[str]:
+    if not len(delta):
+        return None
+    delta_file = DELTA_FILE.format(version=canonical_list_version(canonical_names))
+    _write_atomically(os.path.join(directory, delta_file), lambda f: np.save(f, np.asarray(delta, dtype=np.float32)))
+    return delta_file
+
+def save_snapshot(directory: str, embeddings: np.ndarray, canonical_names: List[str], model_name: str,
+                  delta: Optional[np.ndarray] = None) -> None:
+    """
+    Writes normalized canonical embeddings to `directory` as .npy files plus
+    a manifest recording the model and canonical list they were built from:
+    `embeddings` are the main matrix, and `delta` the rows appended after it
+    (see SegmentedIndex). The files are named after list versions, so the
+    manifest only ever points at complete matrices of the right list;
+    files it no longer points at are deleted afterwards.
+    """
+    os.makedirs(directory, exist_ok=True)
+    base_names = canonical_names[:len(embeddings)]
+    base_version = canonical_list_version(base_names)
+    embeddings_file = EMBEDDINGS_FILE.format(version=base_version)
+    _write_atomically(os.path.join(directory, embeddings_file),
+                      lambda f: np.save(f, np.asarray(embeddings, dtype=np.float32)))
+    _write_manifest(directory, {
+        "model_name": model_name,
+        "canonical_version": canonical_list_version(canonical_names),
+        "base_version": base_version,
+        "embeddings_file": embeddings_file,
+        "delta_file": _save_delta(directory, delta if delta is not None else embeddings[:0], canonical_names),
+        "count": len(canonical_names),
+        "base_count": len(base_names),
+        "dimension": int(embeddings.shape[1]),
+    })
+
+def save_snapshot_delta(directory: str, delta: np.ndarray, canonical_names: List[str], model_name: str) -> bool:
+    """
+    Rewrites only the delta file, for when names were appended and the main
+    matrix is unchanged. Returns False, writing nothing, when the snapshot's
+    main matrix does not hold the first rows of this list; the caller then
+    needs save_snapshot().
+    """
+    manifest = _read_manifest(directory)
+    base_count = len(canonical_names) - len(delta)
+    if (manifest is None or manifest.get("model_name") != model_name or manifest.get("base_count") != base_count
+            or manifest.get("base_version") != canonical_list_version(canonical_names[:base_count])
+            or not os.path.exists(os.path.join(directory, manifest["embeddings_file"]))):
+        return False
+    _write_manifest(directory, {
+        **manifest,
+        "canonical_version": canonical_list_version(canonical_names),
+        "delta_file": _save_delta(directory, delta, canonical_names),
+        "count": len(canonical_names),
+    })
+    return True
+
+def load_snapshot(directory: str, canonical_names: List[str], model_name: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Memory-maps the snapshot in `directory` if it was built with the same
+    model and canonical list; returns None when it is missing or stale.
+    Returns (main matrix, delta rows), ready for a SegmentedIndex. The
+    mappings are read-only, so every worker process shares the same pages.
+    """
+    manifest = _read_manifest(directory)
+    if manifest is None:
+        return None
+    if (manifest.get("model_name") != model_name or "base_count" not in manifest
+            or manifest.get("canonical_version") != canonical_list_version(canonical_names)):
+        print(f"Embedding snapshot in '{directory}' is stale; it will be rebuilt.")
+        return None
+
+    dimension, base_count = manifest.get("dimension"), manifest["base_count"]
+    try:
+        embeddings = np.load(os.path.join(directory, manifest["embeddings_file"]), mmap_mode="r")
+        if manifest.get("delta_file"):
+            delta = np.load(os.path.join(directory, manifest["delta_file"]), mmap_mode="r")
+        else:
+            delta = np.empty((0, dimension), dtype=np.float32)
+    except (FileNotFoundError, ValueError):
+        # Replaced by a newer version since the manifest was read, or not a .npy file
+        return None
+    expected = ((base_count, dimension), (len(canonical_names) - base_count, dimension))
+    if (embeddings.shape, delta.shape) != expected:
+        print(f"Embedding snapshot in '{directory}' has shapes {embeddings.shape} + {delta.shape}, "
+              f"expected {expected[0]} + {expected[1]}; it will be rebuilt.")
+        return None
+    return embeddings, delta
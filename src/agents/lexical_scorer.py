@@ -0,0 +1,71 @@
+# src/agents/lexical_scorer.py
+import copy
+import numpy as np
+from rapidfuzz import process
+from rapidfuzz.distance import JaroWinkler
+from typing import List, Optional, Sequence, Tuple
+
+FULL_SCAN_WORKERS = 1  # Threads for whole-list scans; the API already runs requests on a thread pool
+
+class LexicalScorer:
+    """
+    Batch Jaro-Winkler scoring over the canonical list. The names are kept
+    in a NumPy object array, so a candidate shortlist is one fancy-indexing
+    step, and every query is scored against its candidates in a single
+    `rapidfuzz.process.cdist` call (native code, no per-name Python call).
+    Scores are the same as `jellyfish.jaro_winkler_similarity`.
+    """
+
+    def __init__(self, canonical_names: List[str], workers: int = FULL_SCAN_WORKERS):
+        self.canonical_names = canonical_names
+        self.workers = workers
+        self._names = np.array(canonical_names, dtype=object)
+
+    def add(self, names: List[str]) -> "LexicalScorer":
+        """Returns a new scorer with `names` appended; this one is left untouched."""
+        scorer = copy.copy(self)
+        scorer.canonical_names = self.canonical_names + list(names)
+        scorer._names = np.concatenate([self._names, np.array(names, dtype=object)])
+        return scorer
+
+    def remove(self, positions: Sequence[int]) -> "LexicalScorer":
+        """Returns a new scorer without the names at `positions`; later names shift down."""
+        scorer = copy.copy(self)
+        scorer._names = np.delete(self._names, np.asarray(positions, dtype=np.int64))
+        scorer.canonical_names = scorer._names.tolist()
+        return scorer
+
+    def score_batch(self, queries: Sequence[str], candidate_ids: Optional[Sequence[Sequence[int]]] = None) -> List[np.ndarray]:
+        """
+        Scores every query against its candidates (the whole list by default).
+        Returns one score array per query, aligned with its candidate ids.
+        """
+        if candidate_ids is None:
+            # Same candidates for everyone: one query-by-name matrix
+            return list(process.cdist(queries, self._names, scorer=JaroWinkler.similarity,
+                                      dtype=np.float64, workers=self.workers))
+        return [
+            process.cdist([query], self._names[np.asarray(ids, dtype=np.int64)],
+                          scorer=JaroWinkler.similarity, dtype=np.float64)[0]
+            for query, ids in zip(queries, candidate_ids)
+        ]
+
+    def score(self, query: str, candidate_ids: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Scores one query against its candidates (the whole list by default)."""
+        return self.score_batch([query], None if candidate_ids is None else [candidate_ids])[0]
+
+    def top_k_batch(self, queries: Sequence[str], k: int = 1,
+                    candidate_ids: Optional[Sequence[Sequence[int]]] = None) -> List[List[Tuple[str, float]]]:
+        """Returns the k best (name, score) pairs for each query, best first."""
+        all_ids = np.arange(len(self._names))
+        results = []
+        for i, scores in enumerate(self.score_batch(queries, candidate_ids)):
+            ids = all_ids if candidate_ids is None else np.asarray(candidate_ids[i], dtype=np.int64)
+            # Stable sort keeps the earliest candidate on ties, like max() over a dict
+            order = np.argsort(-scores, kind="stable")[:k]
+            results.append([(self._names[ids[j]], float(scores[j])) for j in order])
+        return results
+
+    def top_k(self, query: str, k: int = 1, candidate_ids: Optional[Sequence[int]] = None) -> List[Tuple[str, float]]:
+        """Returns the k best (name, score) pairs for one query, best first."""
+        return self.top_k_batch([query], k, None if candidate_ids is None else [candidate_ids])[0]
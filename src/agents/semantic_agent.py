@@ -1,24 +1,311 @@
 # src/agents/semantic_agent.py
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-from typing import List, Dict
+import copy
+import itertools
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from src.agents.alias_table import NormalizedNameIndex
+from src.agents.candidate_index import CandidateIndex, DEFAULT_SHORTLIST_SIZE
+from src.agents.embedding_snapshot import load_snapshot, save_snapshot, save_snapshot_delta
+from src.agents.lexical_scorer import LexicalScorer
+from src.agents.vector_index import SegmentedIndex, build_vector_index, normalize_rows
+from src.core.metrics import METRICS, record_stage
+from src.core.resolution_cache import canonical_list_version, normalize_input
 
-class SemanticSearchAgent:
-    def __init__(self, canonical_names: List[str]):
-        print("SemanticSearchAgent: Initializing and loading model... (this may take a moment)")
-        # This model is small and efficient
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'  # This model is small and efficient
+SEMANTIC_TOP_K = 3  # Runner-up suggestions reported alongside the best match
+QUERY_CACHE_SIZE = 10_000  # Input embeddings kept in the LRU cache (~1.5 KB each for MiniLM)
+
+_generations = itertools.count()  # Orders the states built in this process, newest last
+
+class CanonicalState:
+    """
+    Everything derived from one version of the canonical list: the names,
+    their embeddings, the lexical and vector indexes built over them and the
+    normalized-name index used for exact lookups before triage.
+    A state is never modified in place; updates build a new one and the
+    agent swaps it in with a single assignment, so a request that picked
+    up a state keeps seeing consistent names and indexes until it is done.
+    `generation` grows with every state built, so code holding two states
+    (e.g. the resolution cache) can tell which one is newer.
+    """
+
+    def __init__(self, canonical_names: List[str], vector_index, candidate_index: CandidateIndex,
+                 lexical_scorer: LexicalScorer, version: Optional[str] = None,
+                 name_index: Optional[NormalizedNameIndex] = None):
         self.canonical_names = canonical_names
-        # Pre-calculating embeddings is key for performance
-        self.canonical_embeddings = self.model.encode(self.canonical_names)
-        print("SemanticSearchAgent: Model and embeddings are ready.")
+        self.vector_index = vector_index
+        self.candidate_index = candidate_index
+        self.lexical_scorer = lexical_scorer
+        self.name_index = name_index if name_index is not None else NormalizedNameIndex(canonical_names)
+        self._version = version
+        self.generation = next(_generations)
+
+    @property
+    def version(self) -> str:
+        """Fingerprint of the canonical list, computed once per state."""
+        if self._version is None:
+            self._version = canonical_list_version(self.canonical_names)
+        return self._version
+
+    @property
+    def canonical_embeddings(self):
+        """The full embedding matrix (copied together when the index has a delta segment; searches never need it)."""
+        return self.vector_index.embeddings if self.vector_index is not None else None
+
+class SentenceEncoder:
+    """
+    The SentenceTransformer plus an LRU of input embeddings. Agents for
+    different fields can share one encoder, so the model is loaded once per
+    process and the inputs of every field can be encoded in one call.
+    """
+
+    def __init__(self, model_name: str = MODEL_NAME, query_cache_size: int = QUERY_CACHE_SIZE):
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        # LRU of input embeddings, so repeated inputs skip the transformer
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+    @property
+    def model(self):
+        """The SentenceTransformer, imported and loaded on first use to keep startup fast."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    print("SemanticSearchAgent: Loading model...")
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def encode_queries(self, user_inputs: List[str]) -> np.ndarray:
+        """
+        Embeds the inputs, reusing cached embeddings for text seen before.
+        The cache is keyed on the normalized text, and the normalized text is
+        what gets encoded, so every variant of a key maps to the same vector
+        (the MiniLM tokenizer lowercases anyway).
+        """
+        keys = [normalize_input(user_input) for user_input in user_inputs]
+        found: Dict[str, np.ndarray] = {}
+        with self._query_cache_lock:
+            for key in keys:
+                if key in self._query_cache:
+                    self._query_cache.move_to_end(key)
+                    found[key] = self._query_cache[key]
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        METRICS.increment("embedding_cache", len(keys) - len(missing), result="hit")
+        METRICS.increment("embedding_cache", len(missing), result="miss")
+
+        if missing:
+            vectors = np.asarray(self.model.encode(missing), dtype=np.float32)
+            with self._query_cache_lock:
+                for key, vector in zip(missing, vectors):
+                    found[key] = vector
+                    if self.query_cache_size:
+                        self._query_cache[key] = vector
+                        self._query_cache.move_to_end(key)
+                        if len(self._query_cache) > self.query_cache_size:
+                            self._query_cache.popitem(last=False)
+        return np.stack([found[key] for key in keys])
+
+    def memory_footprint(self) -> Dict:
+        """Entries and bytes held by the input-embedding cache."""
+        with self._query_cache_lock:
+            return {
+                "query_cache_entries": len(self._query_cache),
+                "query_cache_bytes": sum(vector.nbytes for vector in self._query_cache.values())
+            }
+
+def best_match_result(top_matches: List[Dict]) -> Dict:
+    """The Semantic Agent's evidence for one input, from its top matches."""
+    return {
+        "best_match_semantic": top_matches[0]["name"],
+        "score_semantic": top_matches[0]["score"],
+        "top_matches_semantic": top_matches
+    }
+
+class SemanticSearchAgent:
+    def __init__(self, canonical_names: List[str], shortlist_size: int = DEFAULT_SHORTLIST_SIZE,
+                 index_kind: str = "exact", snapshot_dir: Optional[str] = None,
+                 query_cache_size: int = QUERY_CACHE_SIZE, encoder: Optional[SentenceEncoder] = None, **index_options):
+        print("SemanticSearchAgent: Initializing... (this may take a moment)")
+        # Agents for different fields pass the same encoder, so they share one model
+        self.encoder = encoder or SentenceEncoder(MODEL_NAME, query_cache_size)
+        self.model_name = self.encoder.model_name
+        self.snapshot_dir = snapshot_dir
+        self.index_kind = index_kind
+        self.index_options = index_options
+        self._update_lock = threading.Lock()
+        # Pre-calculating (and pre-normalizing) embeddings is key for performance.
+        # A matching on-disk snapshot is memory-mapped instead of re-encoding the list.
+        snapshot = load_snapshot(snapshot_dir, canonical_names, self.model_name) if snapshot_dir else None
+        if snapshot is None:
+            embeddings = normalize_rows(self.model.encode(canonical_names))
+            if snapshot_dir:
+                save_snapshot(snapshot_dir, embeddings, canonical_names, self.model_name)
+                snapshot = load_snapshot(snapshot_dir, canonical_names, self.model_name)
+        embeddings, delta = snapshot if snapshot is not None else (embeddings, None)
+        self.state = CanonicalState(
+            canonical_names,
+            # Pluggable vector index: "exact" brute force, "quantized" (float16/int8) or "ivf" for very large lists.
+            # Names added later go to a small delta segment next to it, so adding one never copies the matrix
+            SegmentedIndex(build_vector_index(embeddings, kind=index_kind, **index_options), delta),
+            # Blocking index so the Triage Agent scores a shortlist instead of the whole list
+            CandidateIndex(canonical_names, shortlist_size=shortlist_size),
+            # Encoded name arrays so the Triage Agent scores a whole batch in one vectorized call
+            LexicalScorer(canonical_names)
+        )
+        print("SemanticSearchAgent: Embeddings are ready.")
+
+    # Read-only views of the current state, for callers that only need one of them
+    @property
+    def canonical_names(self) -> List[str]:
+        return self.state.canonical_names
+
+    @property
+    def canonical_embeddings(self):
+        return self.state.canonical_embeddings
+
+    @property
+    def vector_index(self):
+        return self.state.vector_index
+
+    @property
+    def candidate_index(self) -> CandidateIndex:
+        return self.state.candidate_index
+
+    @property
+    def lexical_scorer(self) -> LexicalScorer:
+        return self.state.lexical_scorer
+
+    @property
+    def model(self):
+        """The shared encoder's SentenceTransformer."""
+        return self.encoder.model
+
+    def update_canonical_names(self, added: List[str] = (), removed: List[str] = ()) -> CanonicalState:
+        """
+        Removes every occurrence of the `removed` names and appends the
+        `added` ones, embedding only the new names, then swaps the updated
+        state in atomically. Names already on the list are not added twice.
+        Returns the new state.
+        """
+        with self._update_lock:
+            state = self.state
+            removed = set(removed)
+            positions = [idx for idx, name in enumerate(state.canonical_names) if name in removed]
+            if positions:
+                vector_index = state.vector_index.remove(positions)
+                state = CanonicalState(
+                    [name for name in state.canonical_names if name not in removed],
+                    vector_index,
+                    state.candidate_index.remove(positions),
+                    state.lexical_scorer.remove(positions),
+                    name_index=state.name_index.remove(positions)
+                )
+
+            known = set(state.canonical_names)
+            added = [name for name in dict.fromkeys(added) if name not in known]
+            if added:
+                vector_index = state.vector_index.add(normalize_rows(self.model.encode(added)))
+                state = CanonicalState(
+                    state.canonical_names + added,
+                    vector_index,
+                    state.candidate_index.add(added),
+                    state.lexical_scorer.add(added),
+                    name_index=state.name_index.add(added)
+                )
+
+            if state is self.state:
+                return state
+            return self._swap_state(state)
+
+    def add_canonical_names(self, names: List[str]) -> CanonicalState:
+        """Adds names to the canonical list without re-embedding the existing ones."""
+        return self.update_canonical_names(added=names)
+
+    def remove_canonical_names(self, names: List[str]) -> CanonicalState:
+        """Removes names from the canonical list without re-embedding the rest."""
+        return self.update_canonical_names(removed=names)
+
+    def sync_canonical_names(self, canonical_names: List[str]) -> CanonicalState:
+        """
+        Brings the agent in line with a freshly read canonical list: names
+        that disappeared are removed and new ones are added, so only the
+        difference is embedded.
+        """
+        target = set(canonical_names)
+        current = set(self.canonical_names)
+        return self.update_canonical_names(
+            added=[name for name in canonical_names if name not in current],
+            removed=[name for name in current if name not in target]
+        )
+
+    def _swap_state(self, state: CanonicalState) -> CanonicalState:
+        vector_index = state.vector_index
+        if vector_index.needs_compaction():
+            # Only once the delta has grown: fold it into a rebuilt main index (and a new main snapshot file)
+            vector_index = SegmentedIndex(build_vector_index(vector_index.embeddings, kind=self.index_kind, **self.index_options))
+        if self.snapshot_dir:
+            # Names were only appended: the main matrix file stays as it is and only the small delta file is rewritten
+            appended = vector_index.main is self.state.vector_index.main and save_snapshot_delta(
+                self.snapshot_dir, vector_index.delta, state.canonical_names, self.model_name)
+            if not appended:
+                save_snapshot(self.snapshot_dir, vector_index.main.embeddings, state.canonical_names, self.model_name, vector_index.delta)
+                # Map the saved matrix back in, so updated embeddings stay shared page cache rather than private memory
+                snapshot = load_snapshot(self.snapshot_dir, state.canonical_names, self.model_name)
+                if snapshot is not None:
+                    main = copy.copy(vector_index.main)
+                    main.embeddings = snapshot[0]
+                    vector_index = SegmentedIndex(main, vector_index.delta)
+        state.vector_index = vector_index
+        # A single attribute assignment, so in-flight requests see either the old or the new state
+        self.state = state
+        print(f"SemanticSearchAgent: Canonical list updated ({len(state.canonical_names)} names).")
+        return state
+
+    def encode_queries(self, user_inputs: List[str]) -> np.ndarray:
+        """Embeds the inputs with the (possibly shared) encoder and its input-embedding cache."""
+        return self.encoder.encode_queries(user_inputs)
+
+    def memory_footprint(self) -> Dict:
+        """Bytes held by the vector index (private vs memory-mapped) and the input-embedding cache."""
+        return {**self.vector_index.memory_footprint(), **self.encoder.memory_footprint()}
+
+    def search_embeddings(self, input_embeddings: np.ndarray, k: int = SEMANTIC_TOP_K,
+                          timings: Optional[Dict[str, float]] = None,
+                          state: Optional[CanonicalState] = None) -> List[List[Dict]]:
+        """Searches already-encoded inputs with one matrix product; the top k matches per input, best first."""
+        state = state or self.state
+        start = time.perf_counter()
+        scores, indices = state.vector_index.search(input_embeddings, k)
+        record_stage(timings, "search", start)
+        return [
+            [{"name": state.canonical_names[idx], "score": float(score)} for score, idx in zip(row_scores, row_indices) if idx >= 0]
+            for row_scores, row_indices in zip(scores, indices)
+        ]
+
+    def find_top_matches_batch(self, user_inputs: List[str], k: int = SEMANTIC_TOP_K,
+                               timings: Optional[Dict[str, float]] = None) -> List[List[Dict]]:
+        """Encodes all inputs in one call and searches them with one matrix product."""
+        state = self.state
+        start = time.perf_counter()
+        input_embeddings = self.encode_queries(user_inputs)
+        record_stage(timings, "embedding", start)
+        return self.search_embeddings(input_embeddings, k, timings, state)
+
+    def find_top_matches(self, user_input: str, k: int = SEMANTIC_TOP_K) -> List[Dict]:
+        """Returns the k closest canonical names by semantic meaning, best first."""
+        return self.find_top_matches_batch([user_input], k)[0]
+
+    def find_best_matches(self, user_inputs: List[str], timings: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Batched version of find_best_match; results are in input order."""
+        return [best_match_result(top_matches) for top_matches in self.find_top_matches_batch(user_inputs, timings=timings)]
 
     def find_best_match(self, user_input: str) -> Dict:
         """Finds the best match based on semantic meaning."""
-        input_embedding = self.model.encode([user_input])
-        similarities = cosine_similarity(input_embedding, self.canonical_embeddings)
-        best_match_index = similarities.argmax()
-        return {
-            "best_match_semantic": self.canonical_names[best_match_index],
-            "score_semantic": similarities[0, best_match_index]
-        }
\ No newline at end of file
+        return self.find_best_matches([user_input])[0]
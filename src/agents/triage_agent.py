@@ -1,28 +1,22 @@
 # src/agents/triage_agent.py
 import jellyfish
-from typing import List, Dict
+from typing import List, Dict, Optional
+from src.agents.candidate_index import CandidateIndex
+from src.agents.lexical_scorer import LexicalScorer
 
 # Thresholds ajustados para a nova estratégia
 HIGH_CONFIDENCE_THRESHOLD = 0.95  # Apenas para acertos quase perfeitos
 ESCALATION_THRESHOLD = 0.70     # Limiar para escalar para os especialistas
 
-def run_triage(user_input: str, canonical_names: List[str]) -> Dict:
-    """
-    Performs a quick, low-cost check for obvious matches or clear non-matches.
-    """
-    if not user_input or not user_input.strip():
-        return {"status": "REJECTED", "reason": "Invalid input"}
-
-    scores = {name: jellyfish.jaro_winkler_similarity(user_input, name) for name in canonical_names}
-    best_match = max(scores, key=scores.get)
-    best_score = scores[best_match]
-
+def _verdict(best_match: str, best_score: float, candidates_scored: int) -> Dict:
+    """Turns the best lexical match into the Triage Agent's verdict."""
     if best_score >= HIGH_CONFIDENCE_THRESHOLD:
         return {
             "status": "RESOLVED",
             "action": "AUTO_CORRECT",
             "best_match": best_match,
             "score": best_score,
+            "candidates_scored": candidates_scored,
             "reason": "High confidence lexical match."
         }
     elif best_score < ESCALATION_THRESHOLD:
@@ -31,6 +25,7 @@ def run_triage(user_input: str, canonical_names: List[str]) -> Dict:
             "action": "FLAG_FOR_REVIEW",
             "best_match": best_match,
             "score": best_score,
+            "candidates_scored": candidates_scored,
             "reason": "Low confidence lexical match."
         }
     else:
@@ -39,5 +34,50 @@ def run_triage(user_input: str, canonical_names: List[str]) -> Dict:
             "status": "NEEDS_ESCALATION",
             "best_match_lexical": best_match,
             "score_lexical": best_score,
+            "candidates_scored": candidates_scored,
             "reason": "Ambiguous lexical match. Escalating to specialist agents."
-        }
\ No newline at end of file
+        }
+
+def run_triage(user_input: str, canonical_names: List[str], candidate_index: Optional[CandidateIndex] = None,
+               lexical_scorer: Optional[LexicalScorer] = None) -> Dict:
+    """
+    Performs a quick, low-cost check for obvious matches or clear non-matches.
+    When a candidate index is given, only its shortlist is scored.
+    """
+    if lexical_scorer is not None:
+        return run_triage_batch([user_input], lexical_scorer, candidate_index)[0]
+
+    if not user_input or not user_input.strip():
+        return {"status": "REJECTED", "reason": "Invalid input"}
+
+    candidates = candidate_index.shortlist(user_input) if candidate_index is not None else []
+    if not candidates:
+        # No index, or the input shares no n-grams with anything: score the full list
+        candidates = canonical_names
+
+    scores = {name: jellyfish.jaro_winkler_similarity(user_input, name) for name in candidates}
+    best_match = max(scores, key=scores.get)
+    return _verdict(best_match, scores[best_match], len(candidates))
+
+def run_triage_batch(user_inputs: List[str], lexical_scorer: LexicalScorer,
+                     candidate_index: Optional[CandidateIndex] = None) -> List[Dict]:
+    """
+    Batched version of run_triage: every input is scored against its
+    shortlist (or the whole list) in one vectorized call. Results are in
+    input order.
+    """
+    results: List[Optional[Dict]] = [None] * len(user_inputs)
+    valid, candidate_ids = [], []
+    for i, user_input in enumerate(user_inputs):
+        if not user_input or not user_input.strip():
+            results[i] = {"status": "REJECTED", "reason": "Invalid input"}
+            continue
+        ids = candidate_index.shortlist_indices(user_input) if candidate_index is not None else []
+        valid.append(i)
+        # No index, or the input shares no n-grams with anything: score the full list
+        candidate_ids.append(ids or range(len(lexical_scorer.canonical_names)))
+
+    top_matches = lexical_scorer.top_k_batch([user_inputs[i] for i in valid], k=1, candidate_ids=candidate_ids)
+    for i, ids, (best_match, best_score) in zip(valid, candidate_ids, (matches[0] for matches in top_matches)):
+        results[i] = _verdict(best_match, best_score, len(ids))
+    return results
@@ -0,0 +1,316 @@
+# src/agents/vector_index.py
+import copy
+import numpy as np
+from typing import Dict, Optional, Sequence, Tuple
+
+QUANTIZED_PRECISIONS = ("float16", "int8")
+COMPACT_MIN_ROWS = 10_000  # Rows a delta segment may hold before it is folded into the main index...
+COMPACT_FRACTION = 0.05    # ...unless that is still under 5% of the main index
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Returns the vectors as L2-normalized float32 rows, so a dot product is a cosine similarity."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _top_k(similarities: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Picks the k best columns of each row, best first, without a full sort."""
+    k = min(k, similarities.shape[1])
+    if k < similarities.shape[1]:
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(similarities.shape[1]), (similarities.shape[0], 1))
+    candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidate_scores, order, axis=1), np.take_along_axis(candidates, order, axis=1)
+
+def _footprint(embeddings: np.ndarray) -> Dict:
+    """Size of a full-precision matrix; a memory-mapped one is shared page cache, not private memory."""
+    mapped = isinstance(embeddings, np.memmap) or isinstance(getattr(embeddings, "base", None), np.memmap)
+    return {"vector_bytes": 0 if mapped else int(embeddings.nbytes), "mmapped_bytes": int(embeddings.nbytes) if mapped else 0}
+
+class BruteForceIndex:
+    """
+    Exact search baseline: one float32 matrix product against the
+    pre-normalized canonical embeddings.
+    """
+
+    def __init__(self, embeddings: np.ndarray):
+        # Rows are expected to be normalized already (see normalize_rows)
+        self.embeddings = embeddings
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def search(self, query_vectors: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (scores, indices), each shaped (n_queries, k), best match first."""
+        queries = normalize_rows(query_vectors)
+        return _top_k(queries @ self.embeddings.T, k)
+
+    def memory_footprint(self) -> Dict:
+        """Bytes held by the index."""
+        return _footprint(self.embeddings)
+
+    def add(self, vectors: np.ndarray) -> "BruteForceIndex":
+        """Returns a new index with the normalized `vectors` appended; this one is left untouched."""
+        return BruteForceIndex(np.concatenate([self.embeddings, vectors]))
+
+    def remove(self, positions: Sequence[int]) -> "BruteForceIndex":
+        """Returns a new index without the rows at `positions`; later rows shift down."""
+        return BruteForceIndex(np.delete(self.embeddings, np.asarray(positions, dtype=np.int64), axis=0))
+
+class IVFIndex:
+    """
+    Approximate search with an inverted file: the embeddings are clustered
+    with spherical k-means and a query is only compared against the rows of
+    its `n_probe` closest clusters. Runs locally on CPU with NumPy only.
+    """
+
+    def __init__(self, embeddings: np.ndarray, n_lists: int = 0, n_probe: int = 8,
+                 n_iter: int = 10, seed: int = 0, chunk_size: int = 65536):
+        self.embeddings = embeddings
+        self.n_probe = n_probe
+        self._chunk_size = chunk_size
+        n_rows = len(embeddings)
+        # sqrt(N) clusters is the usual starting point for IVF
+        n_lists = n_lists or max(1, int(np.sqrt(n_rows)))
+        self.n_lists = min(n_lists, n_rows)
+        self.centroids = self._train(np.random.default_rng(seed), n_iter)
+        assignments = self._assign(self.embeddings)
+        self._lists = [np.flatnonzero(assignments == cell) for cell in range(self.n_lists)]
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        """Nearest centroid for every row, computed in chunks to bound memory."""
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), self._chunk_size):
+            chunk = vectors[start:start + self._chunk_size]
+            assignments[start:start + len(chunk)] = (chunk @ self.centroids.T).argmax(axis=1)
+        return assignments
+
+    def _train(self, rng: np.random.Generator, n_iter: int) -> np.ndarray:
+        # A sample of ~256 points per cell is plenty to place the centroids
+        sample_size = min(len(self.embeddings), self.n_lists * 256)
+        sample = self.embeddings[np.sort(rng.choice(len(self.embeddings), sample_size, replace=False))]
+        centroids = sample[rng.choice(sample_size, self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = (sample @ centroids.T).argmax(axis=1)
+            for cell in range(self.n_lists):
+                members = sample[labels == cell]
+                if len(members):
+                    centroids[cell] = members.sum(axis=0)
+            centroids = normalize_rows(centroids)
+        return centroids
+
+    def search(self, query_vectors: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (scores, indices), each shaped (n_queries, k), best match first."""
+        queries = normalize_rows(query_vectors)
+        n_probe = min(self.n_probe, self.n_lists)
+        _, cells = _top_k(queries @ self.centroids.T, n_probe)
+
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        for row, query in enumerate(queries):
+            candidates = np.concatenate([self._lists[cell] for cell in cells[row]])
+            if not len(candidates):
+                continue
+            scores, positions = _top_k((self.embeddings[candidates] @ query)[np.newaxis, :], k)
+            all_scores[row, :scores.shape[1]] = scores[0]
+            all_indices[row, :positions.shape[1]] = candidates[positions[0]]
+        return all_scores, all_indices
+
+    def memory_footprint(self) -> Dict:
+        """Bytes held by the index."""
+        footprint = _footprint(self.embeddings)
+        footprint["vector_bytes"] += int(self.centroids.nbytes + sum(rows.nbytes for rows in self._lists))
+        return footprint
+
+    def add(self, vectors: np.ndarray) -> "IVFIndex":
+        """
+        Returns a new index with the normalized `vectors` appended to their
+        nearest existing cluster; this one is left untouched. Centroids are
+        not retrained, so after many additions a full rebuild gives better
+        recall.
+        """
+        index = copy.copy(self)
+        index.embeddings = np.concatenate([self.embeddings, vectors])
+        assignments = self._assign(vectors) if len(vectors) else np.empty(0, dtype=np.int64)
+        new_rows = np.arange(len(self.embeddings), len(index.embeddings))
+        index._lists = [np.concatenate([rows, new_rows[assignments == cell]]) for cell, rows in enumerate(self._lists)]
+        return index
+
+    def remove(self, positions: Sequence[int]) -> "IVFIndex":
+        """Returns a new index without the rows at `positions`; later rows shift down."""
+        keep = np.ones(len(self.embeddings), dtype=bool)
+        keep[np.asarray(positions, dtype=np.int64)] = False
+        new_positions = np.cumsum(keep) - 1
+        index = copy.copy(self)
+        index.embeddings = self.embeddings[keep]
+        index._lists = [new_positions[rows[keep[rows]]] for rows in self._lists]
+        return index
+
+class QuantizedIndex:
+    """
+    Compact exact-search index: the canonical matrix is kept as float16
+    (half the memory) or int8 with a per-dimension scale (a quarter), and
+    scanned in chunks. The best `rerank` rows per query are then re-scored
+    against the full-precision embeddings, so returned scores are exact.
+    Those are only read for the re-ranked rows, so when they are memory-mapped
+    from a snapshot most of the float32 matrix never has to be resident.
+    """
+
+    def __init__(self, embeddings: np.ndarray, precision: str = "int8", rerank: int = 32, chunk_size: int = 65536):
+        if precision not in QUANTIZED_PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}'. Choose one of: {', '.join(QUANTIZED_PRECISIONS)}")
+        self.embeddings = embeddings
+        self.precision = precision
+        self.rerank = rerank
+        self._chunk_size = chunk_size
+        if precision == "int8":
+            # Normalized rows keep every component in [-1, 1]; a per-dimension scale uses the full int8 range
+            max_abs = np.zeros(embeddings.shape[1], dtype=np.float32)
+            for start in range(0, len(embeddings), chunk_size):
+                max_abs = np.maximum(max_abs, np.abs(embeddings[start:start + chunk_size]).max(axis=0))
+            self.scales = np.maximum(max_abs, 1e-12) / 127.0
+        else:
+            self.scales = None
+        self.codes = self._quantize(embeddings)
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def _quantize(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.empty((len(vectors), vectors.shape[1]), dtype=np.int8 if self.scales is not None else np.float16)
+        for start in range(0, len(vectors), self._chunk_size):
+            chunk = np.asarray(vectors[start:start + self._chunk_size], dtype=np.float32)
+            if self.scales is not None:
+                chunk = np.clip(np.rint(chunk / self.scales), -127, 127)
+            codes[start:start + len(chunk)] = chunk
+        return codes
+
+    def search(self, query_vectors: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (scores, indices), each shaped (n_queries, k), best match first."""
+        queries = normalize_rows(query_vectors)
+        # Folding the int8 scales into the queries keeps the scan to one product per chunk
+        scaled = queries * self.scales if self.scales is not None else queries
+        n_candidates = min(max(self.rerank, k), len(self.codes))
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_indices = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self.codes), self._chunk_size):
+            chunk = self.codes[start:start + self._chunk_size].astype(np.float32)
+            scores, positions = _top_k(scaled @ chunk.T, n_candidates)
+            best_scores, merged = _top_k(np.concatenate([best_scores, scores], axis=1), n_candidates)
+            best_indices = np.take_along_axis(np.concatenate([best_indices, positions + start], axis=1), merged, axis=1)
+
+        # --- Exact re-rank of the shortlisted rows ---
+        exact = np.einsum("qd,qcd->qc", queries, np.asarray(self.embeddings[best_indices.ravel()]).reshape(*best_indices.shape, -1))
+        scores, order = _top_k(exact, k)
+        return scores, np.take_along_axis(best_indices, order, axis=1)
+
+    def memory_footprint(self) -> Dict:
+        """Bytes held by the index; the full-precision rows are only touched for re-ranking."""
+        footprint = _footprint(self.embeddings)
+        footprint["vector_bytes"] += int(self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+        return footprint
+
+    def add(self, vectors: np.ndarray) -> "QuantizedIndex":
+        """
+        Returns a new index with the normalized `vectors` appended; this one
+        is left untouched. New rows reuse the existing int8 scales.
+        """
+        index = copy.copy(self)
+        index.embeddings = np.concatenate([self.embeddings, vectors])
+        index.codes = np.concatenate([self.codes, self._quantize(vectors)])
+        return index
+
+    def remove(self, positions: Sequence[int]) -> "QuantizedIndex":
+        """Returns a new index without the rows at `positions`; later rows shift down."""
+        positions = np.asarray(positions, dtype=np.int64)
+        index = copy.copy(self)
+        index.embeddings = np.delete(self.embeddings, positions, axis=0)
+        index.codes = np.delete(self.codes, positions, axis=0)
+        return index
+
+class SegmentedIndex:
+    """
+    A vector index plus a small delta segment of rows appended since it was
+    built. Appends only copy the delta, which is searched exactly next to
+    the main index, so the main matrix (and the snapshot file it is mapped
+    from) is left alone; needs_compaction() tells the owner when the delta
+    has grown enough to be folded in with a rebuild.
+    """
+
+    def __init__(self, main, delta: Optional[np.ndarray] = None):
+        self.main = main
+        self.delta = delta if delta is not None else np.empty((0, main.embeddings.shape[1]), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.main) + len(self.delta)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Every row, main first; a copy when there is a delta, so searches never use it."""
+        return np.concatenate([self.main.embeddings, self.delta]) if len(self.delta) else self.main.embeddings
+
+    def search(self, query_vectors: np.ndarray, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (scores, indices), each shaped (n_queries, k), best match first."""
+        scores, indices = self.main.search(query_vectors, k)
+        if not len(self.delta):
+            return scores, indices
+        delta_scores, delta_indices = _top_k(normalize_rows(query_vectors) @ self.delta.T, k)
+        scores, order = _top_k(np.concatenate([scores, delta_scores], axis=1), k)
+        indices = np.concatenate([indices, delta_indices + len(self.main)], axis=1)
+        return scores, np.take_along_axis(indices, order, axis=1)
+
+    def memory_footprint(self) -> Dict:
+        """Bytes held by the main index and the delta segment."""
+        footprint = self.main.memory_footprint()
+        footprint["vector_bytes"] += int(self.delta.nbytes)
+        return footprint
+
+    def add(self, vectors: np.ndarray) -> "SegmentedIndex":
+        """Returns a new index with the normalized `vectors` appended to the delta; this one is left untouched."""
+        return SegmentedIndex(self.main, np.concatenate([self.delta, vectors]))
+
+    def remove(self, positions: Sequence[int]) -> "SegmentedIndex":
+        """Returns a new index without the rows at `positions`; later rows shift down."""
+        positions = np.asarray(positions, dtype=np.int64)
+        main_positions = positions[positions < len(self.main)]
+        main = self.main.remove(main_positions) if len(main_positions) else self.main
+        return SegmentedIndex(main, np.delete(self.delta, positions[positions >= len(self.main)] - len(self.main), axis=0))
+
+    def needs_compaction(self) -> bool:
+        return len(self.delta) > max(COMPACT_MIN_ROWS, COMPACT_FRACTION * len(self.main))
+
+VECTOR_INDEX_KINDS = {
+    "exact": BruteForceIndex,
+    "ivf": IVFIndex,
+    "quantized": QuantizedIndex,
+}
+
+def build_vector_index(embeddings: np.ndarray, kind: str = "exact", **options):
+    """Creates the vector index of the requested kind over normalized embeddings."""
+    if kind not in VECTOR_INDEX_KINDS:
+        raise ValueError(f"Unknown vector index '{kind}'. Choose one of: {', '.join(VECTOR_INDEX_KINDS)}")
+    return VECTOR_INDEX_KINDS[kind](embeddings, **options)
+
+
+def compare_with_exact(index, embeddings: np.ndarray, query_vectors: np.ndarray, k: int = 1) -> Dict:
+    """
+    Accuracy delta of an approximate or compact index against exact search
+    on the same queries: how often the top match agrees, recall@k and the
+    mean drop in the best score.
+    """
+    exact_scores, exact_indices = BruteForceIndex(embeddings).search(query_vectors, k)
+    scores, indices = index.search(query_vectors, k)
+    recall = np.mean([len(set(found) & set(expected)) / len(expected) for found, expected in zip(indices, exact_indices)])
+    return {
+        "queries": len(query_vectors),
+        "top1_agreement": float(np.mean(indices[:, 0] == exact_indices[:, 0])),
+        f"recall_at_{k}": float(recall),
+        "mean_top1_score_delta": float(np.mean(exact_scores[:, 0] - scores[:, 0])),
+    }
@@ -0,0 +1,41 @@
+# src/core/concurrency.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+# Encoding and similarity search release the GIL in NumPy/PyTorch, so a
+# thread pool is enough to keep them off the event loop without copying
+# the model into other processes.
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", os.cpu_count() or 4))
+MAX_PENDING_REQUESTS = int(os.getenv("MAX_PENDING_REQUESTS", 256))
+
+def create_cpu_executor(workers: int = CPU_WORKERS) -> ThreadPoolExecutor:
+    """Bounded pool that runs the CPU-bound pipeline stages."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pipeline")
+
+class RequestLimiter:
+    """
+    Admission control for the API. Once `max_pending` requests are in
+    flight, new ones are rejected straight away instead of queueing behind
+    them, so clients get a fast "retry later" rather than a slow timeout.
+    Used from the event loop thread only, so plain counters are safe.
+    """
+
+    def __init__(self, max_pending: int = MAX_PENDING_REQUESTS):
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        """Takes a slot if one is free; returns False when the service is saturated."""
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self.in_flight -= 1
+
+    def stats(self) -> Dict:
+        return {"in_flight": self.in_flight, "max_pending": self.max_pending, "rejected": self.rejected}
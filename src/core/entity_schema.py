@@ -0,0 +1,84 @@
+# src/core/entity_schema.py
+import json
+import os
+from typing import Dict, List, Optional
+from src.agents.candidate_index import DEFAULT_SHORTLIST_SIZE
+from src.agents.semantic_agent import SemanticSearchAgent, SentenceEncoder
+from src.core.record_store import RecordStore
+from src.core.resolution_cache import ResolutionCache, DEFAULT_CACHE_PATH
+
+COMPANY_FIELD = "company"
+
+# Which fields can be standardized and where each one's canonical values live in the record store.
+# Override with a JSON file of the same shape, e.g. adding
+# "title": {"table": "employees", "column": "Title"} to standardize job titles.
+DEFAULT_ENTITY_SCHEMA = {
+    COMPANY_FIELD: {"table": "companies", "column": "CompanyName"},
+    "city": {"table": "companies", "column": "City"},
+    "state": {"table": "companies", "column": "State"},
+    "country": {"table": "companies", "column": "Country"},
+}
+
+class EntityField:
+    """One standardizable field: its canonical values' source and its agent's index settings."""
+
+    def __init__(self, name: str, table: str, column: str, shortlist_size: int = DEFAULT_SHORTLIST_SIZE,
+                 index: str = "exact", precision: str = "int8"):
+        self.name = name
+        self.table = table
+        self.column = column
+        self.shortlist_size = shortlist_size
+        self.index = index
+        self.precision = precision
+
+    def canonical_values(self, record_store: RecordStore) -> List[str]:
+        """The field's canonical list (the company list keeps its duplicates and order, as elsewhere)."""
+        if (self.table, self.column) == ("companies", "CompanyName"):
+            return record_store.company_names()
+        return record_store.distinct_values(self.table, self.column)
+
+def load_entity_schema(path: Optional[str] = None) -> Dict[str, EntityField]:
+    """Reads a JSON schema of {field: {"table", "column", ...options}}, or returns the default one."""
+    schema = DEFAULT_ENTITY_SCHEMA
+    if path:
+        with open(path) as f:
+            schema = json.load(f)
+    return {name: EntityField(name, **options) for name, options in schema.items()}
+
+def build_field_agents(schema: Dict[str, EntityField], record_store: RecordStore, snapshot_dir: Optional[str] = None,
+                       encoder: Optional[SentenceEncoder] = None,
+                       agents: Optional[Dict[str, SemanticSearchAgent]] = None) -> Dict[str, SemanticSearchAgent]:
+    """
+    Builds one SemanticSearchAgent per field, each with its own lexical and
+    vector indexes but all sharing one encoder, so the model is loaded once.
+    Agents already built (e.g. the API's company agent) are passed in
+    `agents` and reused. Each field gets its own snapshot subdirectory.
+    Fields with no canonical values are skipped.
+    """
+    field_agents = dict(agents or {})
+    if encoder is None:
+        # Share the encoder of an agent passed in, if it has one (a remote agent does not)
+        encoder = next((agent.encoder for agent in field_agents.values() if hasattr(agent, "encoder")), None) or SentenceEncoder()
+
+    for name, field in schema.items():
+        if name in field_agents:
+            continue
+        canonical_values = field.canonical_values(record_store)
+        if not canonical_values:
+            print(f"Skipping field '{name}': no values in {field.table}.{field.column}.")
+            continue
+        index_options = {"precision": field.precision} if field.index == "quantized" else {}
+        field_agents[name] = SemanticSearchAgent(
+            canonical_values, shortlist_size=field.shortlist_size, index_kind=field.index,
+            snapshot_dir=os.path.join(snapshot_dir, name) if snapshot_dir else None, encoder=encoder, **index_options
+        )
+    return field_agents
+
+def build_field_caches(field_agents: Dict[str, SemanticSearchAgent], path: Optional[str] = DEFAULT_CACHE_PATH,
+                       caches: Optional[Dict[str, ResolutionCache]] = None) -> Dict[str, ResolutionCache]:
+    """One resolution cache per field, each in its own table of the shared cache file."""
+    field_caches = dict(caches or {})
+    for name, agent in field_agents.items():
+        if name not in field_caches:
+            field_caches[name] = ResolutionCache(agent.state.version, path, table=f"resolutions_{name}")
+    return field_caches
@@ -0,0 +1,327 @@
+# src/core/inference_server.py
+import os
+import queue
+import secrets
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from typing import Dict, List, Optional, Tuple, Union
+from src.agents.candidate_index import CandidateIndex, DEFAULT_SHORTLIST_SIZE
+from src.agents.lexical_scorer import LexicalScorer
+from src.agents.semantic_agent import SEMANTIC_TOP_K, CanonicalState, SemanticSearchAgent, best_match_result
+from src.core.metrics import METRICS, record_stage
+
+DEFAULT_ADDRESS = "data/inference.sock"        # A Unix socket only this user can connect to
+DEFAULT_AUTHKEY_PATH = "data/inference_server.key"  # Random key the server writes on first start (mode 0600)
+MAX_BATCH_SIZE = 256             # Inputs encoded together in one model call
+MAX_BATCH_WAIT_SECONDS = 0.002   # How long a batch waits for jobs from other requests to join it
+INFERENCE_WORKERS = 2            # Batches in flight at once; PyTorch spreads each one over several cores
+VERSION_CHECK_SECONDS = 5.0      # How often API workers check whether the canonical list changed
+LISTEN_BACKLOG = 128             # The default of 1 stalls handshakes when many worker threads connect at once
+
+def parse_address(address: str) -> Union[str, Tuple[str, int]]:
+    """"host:port" is a TCP address; anything else is a Unix socket path."""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+def load_authkey(path: str = DEFAULT_AUTHKEY_PATH, create: bool = False) -> bytes:
+    """
+    The shared secret API workers authenticate with. There is deliberately
+    no default: every message is unpickled, so anyone who can connect can
+    run code in the other process. INFERENCE_SERVER_AUTHKEY wins; otherwise
+    the key is read from `path`, which the server (`create=True`) fills
+    with a random key readable only by its owner.
+    """
+    authkey = os.getenv("INFERENCE_SERVER_AUTHKEY")
+    if authkey:
+        return authkey.encode()
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # mkstemp creates the file with mode 0600; linking it into place is atomic and never overwrites
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".")
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+        try:
+            os.link(temp_path, path)
+            print(f"InferenceServer: Wrote a new authentication key to '{path}'.")
+        except FileExistsError:
+            pass # Another server created it first; use theirs
+        finally:
+            os.unlink(temp_path)
+    try:
+        with open(path) as f:
+            return f.read().strip().encode()
+    except FileNotFoundError:
+        raise RuntimeError(f"No inference server key: set INFERENCE_SERVER_AUTHKEY, or start the inference "
+                           f"server first so it writes one to '{path}'.")
+
+def _prepare_socket_path(path: str) -> None:
+    """Creates the socket's directory and removes a socket file left behind by a server that was killed."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX) as probe:
+        try:
+            probe.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise OSError(f"Another inference server is already listening on '{path}'.")
+
+class InferenceServer:
+    """
+    Owns the node's only SentenceTransformer and its canonical embeddings
+    (memory-mapped from the snapshot). API worker processes send search
+    jobs over a local socket; jobs that arrive while a batch is running
+    are merged into the next one, so concurrent requests from every worker
+    share one encode call and one similarity search.
+    """
+
+    def __init__(self, agent: SemanticSearchAgent, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_seconds: float = MAX_BATCH_WAIT_SECONDS, workers: int = INFERENCE_WORKERS):
+        self.agent = agent
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.workers = workers
+        self.batches = self.jobs = 0
+        self._queue: "queue.Queue[Tuple[List[str], int, Future, float]]" = queue.Queue()
+
+    def submit(self, user_inputs: List[str], k: int = SEMANTIC_TOP_K) -> Future:
+        """Queues a search job; the future resolves to (top matches per input, timings, canonical version)."""
+        future: Future = Future()
+        self._queue.put((user_inputs, k, future, time.perf_counter()))
+        return future
+
+    def _next_batch(self) -> List[Tuple[List[str], int, Future, float]]:
+        batch = [self._queue.get()]
+        size = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait_seconds
+        while size < self.max_batch_size:
+            try:
+                job = self._queue.get(timeout=max(deadline - time.perf_counter(), 0.0)) if self.max_wait_seconds else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(job)
+            size += len(job[0])
+        return batch
+
+    def _work(self) -> None:
+        while True:
+            batch = self._next_batch()
+            started, timings = time.perf_counter(), {}
+            try:
+                version = self.agent.state.version
+                inputs = [user_input for user_inputs, _, _, _ in batch for user_input in user_inputs]
+                top_matches = self.agent.find_top_matches_batch(inputs, max(k for _, k, _, _ in batch), timings)
+                self.batches += 1
+                self.jobs += len(batch)
+                offset = 0
+                for user_inputs, k, future, queued_at in batch:
+                    job_matches = [matches[:k] for matches in top_matches[offset:offset + len(user_inputs)]]
+                    offset += len(user_inputs)
+                    future.set_result((job_matches, {"inference_queue": started - queued_at, **timings}, version))
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+
+    def _handle(self, operation: str, payload):
+        if operation == "search":
+            user_inputs, k = payload
+            return self.submit(user_inputs, k).result()
+        if operation == "version":
+            return self.agent.state.version
+        if operation == "names":
+            state = self.agent.state
+            return state.canonical_names, state.version
+        if operation == "update":
+            added, removed = payload
+            return self.agent.update_canonical_names(added, removed).version
+        if operation == "sync":
+            return self.agent.sync_canonical_names(payload).version
+        if operation == "stats":
+            return {"memory": self.agent.memory_footprint(), "batches": self.batches, "jobs": self.jobs,
+                    "version": self.agent.state.version}
+        raise ValueError(f"Unknown operation '{operation}'")
+
+    def _serve_connection(self, connection) -> None:
+        with connection:
+            while True:
+                try:
+                    operation, payload = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self._handle(operation, payload))
+                except Exception as e:
+                    reply = ("error", f"{type(e).__name__}: {e}")
+                connection.send(reply)
+
+    def serve_forever(self, address: str = DEFAULT_ADDRESS, authkey: Optional[bytes] = None) -> None:
+        """
+        Starts the batching workers and serves API workers until the process
+        is stopped. Without an `authkey` one is loaded (or created) with
+        load_authkey(). A Unix socket is created readable and writable by
+        its owner only.
+        """
+        authkey = authkey or load_authkey(create=True)
+        listen_address = parse_address(address)
+        previous_umask = None
+        if isinstance(listen_address, str):
+            _prepare_socket_path(listen_address)
+            previous_umask = os.umask(0o177)
+        try:
+            listener = Listener(listen_address, backlog=LISTEN_BACKLOG, authkey=authkey)
+        finally:
+            if previous_umask is not None:
+                os.umask(previous_umask)
+
+        for _ in range(self.workers):
+            threading.Thread(target=self._work, daemon=True).start()
+        with listener:
+            print(f"InferenceServer: Listening on {address} ({len(self.agent.canonical_names)} canonical names).")
+            while True:
+                try:
+                    connection = listener.accept()
+                except (AuthenticationError, OSError, EOFError) as e:
+                    print(f"InferenceServer: Rejected a connection: {e}")
+                    continue
+                threading.Thread(target=self._serve_connection, args=(connection,), daemon=True).start()
+
+class RemoteSemanticAgent:
+    """
+    Stand-in for SemanticSearchAgent in API worker processes. The names
+    and the lexical indexes (small) are kept locally for triage, while
+    encoding and vector search go to the InferenceServer, so no worker
+    loads the model or the embedding matrix. Canonical-list changes made
+    through any worker are picked up by the others within
+    `version_check_seconds`.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, authkey: Optional[bytes] = None,
+                 shortlist_size: int = DEFAULT_SHORTLIST_SIZE, version_check_seconds: float = VERSION_CHECK_SECONDS):
+        self.address = parse_address(address)
+        self.shortlist_size = shortlist_size
+        self.version_check_seconds = version_check_seconds
+        self._authkey = authkey or load_authkey()
+        # Connections are not thread-safe, so each call borrows one from the pool
+        self._connections: "queue.LifoQueue" = queue.LifoQueue()
+        self._refresh_lock = threading.Lock()
+        names, version = self._call("names")
+        self._state = self._build_state(names, version)
+        self._checked_at = time.monotonic()
+
+    def _call(self, operation: str, payload=None):
+        try:
+            connection = self._connections.get_nowait()
+        except queue.Empty:
+            try:
+                connection = Client(self.address, authkey=self._authkey)
+            except (AuthenticationError, OSError) as e:
+                METRICS.increment("errors", kind="inference_server")
+                raise ConnectionError(f"Could not connect to the inference server at {self.address}: {e}")
+        try:
+            connection.send((operation, payload))
+            status, result = connection.recv()
+        except (EOFError, OSError) as e:
+            connection.close()
+            METRICS.increment("errors", kind="inference_server")
+            raise ConnectionError(f"Lost connection to the inference server at {self.address}: {e}")
+        self._connections.put(connection)
+        if status == "error":
+            METRICS.increment("errors", kind="inference_server")
+            raise RuntimeError(f"Inference server error: {result}")
+        return result
+
+    def _build_state(self, names: List[str], version: str) -> CanonicalState:
+        return CanonicalState(names, None, CandidateIndex(names, shortlist_size=self.shortlist_size),
+                              LexicalScorer(names), version)
+
+    def _refresh(self, version: str) -> None:
+        """Brings the local names and lexical indexes up to the server's canonical version."""
+        if version == self._state.version:
+            return
+        with self._refresh_lock:
+            if version == self._state.version:
+                return
+            names, version = self._call("names")
+            state = self._state
+            target, current = set(names), set(state.canonical_names)
+            removed = [idx for idx, name in enumerate(state.canonical_names) if name not in target]
+            added = [name for name in names if name not in current]
+            candidate_index, lexical_scorer, name_index = state.candidate_index, state.lexical_scorer, state.name_index
+            if removed:
+                candidate_index, lexical_scorer = candidate_index.remove(removed), lexical_scorer.remove(removed)
+                name_index = name_index.remove(removed)
+            if added:
+                candidate_index, lexical_scorer = candidate_index.add(added), lexical_scorer.add(added)
+                name_index = name_index.add(added)
+            if lexical_scorer.canonical_names == names:
+                self._state = CanonicalState(names, None, candidate_index, lexical_scorer, version, name_index)
+            else:
+                # The server's order differs from what the diff produced: rebuild (still no embedding involved)
+                self._state = self._build_state(names, version)
+
+    @property
+    def state(self) -> CanonicalState:
+        if time.monotonic() - self._checked_at > self.version_check_seconds:
+            self._checked_at = time.monotonic()
+            self._refresh(self._call("version"))
+        return self._state
+
+    @property
+    def canonical_names(self) -> List[str]:
+        return self._state.canonical_names
+
+    @property
+    def candidate_index(self) -> CandidateIndex:
+        return self._state.candidate_index
+
+    @property
+    def lexical_scorer(self) -> LexicalScorer:
+        return self._state.lexical_scorer
+
+    def find_top_matches_batch(self, user_inputs: List[str], k: int = SEMANTIC_TOP_K,
+                               timings: Optional[Dict[str, float]] = None) -> List[List[Dict]]:
+        """Sends the inputs to the inference server, where they are batched with other workers' requests."""
+        start = time.perf_counter()
+        top_matches, server_timings, version = self._call("search", (user_inputs, k))
+        record_stage(timings, "inference_rpc", start)
+        for stage, seconds in server_timings.items():
+            METRICS.observe(stage, seconds)
+            if timings is not None:
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        self._refresh(version)
+        return top_matches
+
+    def find_top_matches(self, user_input: str, k: int = SEMANTIC_TOP_K) -> List[Dict]:
+        return self.find_top_matches_batch([user_input], k)[0]
+
+    def find_best_matches(self, user_inputs: List[str], timings: Optional[Dict[str, float]] = None) -> List[Dict]:
+        return [best_match_result(top_matches) for top_matches in self.find_top_matches_batch(user_inputs, timings=timings)]
+
+    def find_best_match(self, user_input: str) -> Dict:
+        return self.find_best_matches([user_input])[0]
+
+    def update_canonical_names(self, added: List[str] = (), removed: List[str] = ()) -> CanonicalState:
+        """Applies the change on the inference server (which embeds only the new names), then locally."""
+        self._refresh(self._call("update", (list(added), list(removed))))
+        return self._state
+
+    def add_canonical_names(self, names: List[str]) -> CanonicalState:
+        return self.update_canonical_names(added=names)
+
+    def remove_canonical_names(self, names: List[str]) -> CanonicalState:
+        return self.update_canonical_names(removed=names)
+
+    def sync_canonical_names(self, canonical_names: List[str]) -> CanonicalState:
+        self._refresh(self._call("sync", list(canonical_names)))
+        return self._state
+
+    def memory_footprint(self) -> Dict:
+        """The inference server's footprint; this process holds no embeddings."""
+        return self._call("stats")["memory"]
@@ -0,0 +1,85 @@
+# src/core/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets, from sub-millisecond triage to slow LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRIC_PREFIX = "standardizer"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_sample(name: str, value: float, labels: Optional[Dict[str, str]] = None) -> str:
+    """One line of the Prometheus text format, e.g. `name{stage="triage"} 1.0`."""
+    if labels:
+        escaped = ",".join(f'{key}="{_escape(str(val))}"' for key, val in labels.items())
+        return f"{name}{{{escaped}}} {value}"
+    return f"{name} {value}"
+
+class PipelineMetrics:
+    """
+    In-process latency histograms per pipeline stage and counters for
+    outcomes and error paths, rendered in the Prometheus text format.
+    Recording is a lock plus a few additions, cheap enough for the hot path.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._bucket_counts: Dict[str, List[int]] = defaultdict(lambda: [0] * (len(self.buckets) + 1))
+        self._sums: Dict[str, float] = defaultdict(float)
+        self._counters: Dict[Tuple[str, Labels], float] = defaultdict(float)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Records how long one call to a stage took."""
+        with self._lock:
+            self._bucket_counts[stage][bisect_left(self.buckets, seconds)] += 1
+            self._sums[stage] += seconds
+
+    def increment(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        """Adds to a counter, e.g. increment("results", status="RESOLVED", action="AUTO_CORRECT")."""
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def render(self) -> List[str]:
+        """All histograms and counters as Prometheus text-format lines."""
+        histogram = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [f"# HELP {histogram} Time spent per call in each pipeline stage.", f"# TYPE {histogram} histogram"]
+        with self._lock:
+            for stage in sorted(self._bucket_counts):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), self._bucket_counts[stage]):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(format_sample(f"{histogram}_bucket", cumulative, {"stage": stage, "le": le}))
+                lines.append(format_sample(f"{histogram}_sum", self._sums[stage], {"stage": stage}))
+                lines.append(format_sample(f"{histogram}_count", cumulative, {"stage": stage}))
+
+            names = sorted({name for name, _ in self._counters})
+            for name in names:
+                metric = f"{METRIC_PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for (counter_name, labels), value in sorted(self._counters.items()):
+                    if counter_name == name:
+                        lines.append(format_sample(metric, value, dict(labels)))
+        return lines
+
+# Process-wide metrics shared by the orchestrator, the agents and the API
+METRICS = PipelineMetrics()
+
+def record_stage(timings: Optional[Dict[str, float]], stage: str, start: float) -> float:
+    """
+    Records the time since `start` for a stage in the process-wide metrics
+    and, when a per-request `timings` dict is given, adds it to the stage's
+    total there. Returns the current time, to chain consecutive stages.
+    """
+    now = time.perf_counter()
+    METRICS.observe(stage, now - start)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + now - start
+    return now
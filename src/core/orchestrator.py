@@ -1,37 +1,466 @@
 # src/core/orchestrator.py
 from src.agents import triage_agent, decision_agent
-from src.agents.semantic_agent import SemanticSearchAgent
-from typing import List, Dict
+from src.agents.alias_table import AliasTable
+from src.agents.semantic_agent import SemanticSearchAgent, best_match_result
+from src.core.resolution_cache import ResolutionCache
+from src.core.metrics import METRICS, record_stage
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor
+from typing import List, Dict, Optional, Tuple
 
-def run_standardization_pipeline(user_input: str, semantic_agent: SemanticSearchAgent) -> Dict:
+# Statuses of verdicts that went past the Triage Agent
+ESCALATED_STATUSES = ("RESOLVED_BY_RULES", "RESOLVED_BY_LLM")
+
+class DecisionRules:
     """
-    Manages the full pipeline of agents to standardize a company name.
+    Local, deterministic version of the Decision Agent's rules. Escalated
+    cases the rules can settle never reach the LLM; only the ones they leave
+    undecided do. Each rule can be switched off individually.
+
+    The Rule of Doubt only fires when both scores are below `doubt_ceiling`;
+    cases where the agents disagree but one of them is fairly confident
+    (between the ceiling and the high-confidence threshold) are the genuinely
+    undecided ones and are left to the LLM.
     """
-    # === STAGE 1: Triage Agent ===
-    triage_result = triage_agent.run_triage(user_input, semantic_agent.canonical_names)
 
-    if triage_result["status"] == "RESOLVED":
-        # The case was simple and resolved by the Triage Agent
-        return triage_result
+    def __init__(self, consensus: bool = True, high_confidence: bool = True, doubt: bool = True,
+                 high_confidence_threshold: float = 0.96, doubt_ceiling: float = 0.85):
+        self.consensus = consensus
+        self.high_confidence = high_confidence
+        self.doubt = doubt
+        self.high_confidence_threshold = high_confidence_threshold
+        self.doubt_ceiling = doubt_ceiling
+        self.llm_calls_saved = 0
+        self.llm_calls_needed = 0
+        self._lock = threading.Lock()
+
+    def evaluate(self, dossier: Dict) -> Optional[Dict]:
+        """Returns a decision in the Decision Agent's format, or None when the LLM must decide."""
+        lexical, semantic = dossier.get("best_match_lexical"), dossier.get("best_match_semantic")
+        score_lexical, score_semantic = dossier.get("score_lexical") or 0.0, dossier.get("score_semantic") or 0.0
 
-    # === STAGE 2: Semantic Agent (Escalation) ===
-    semantic_result = semantic_agent.find_best_match(user_input)
+        decision = None
+        if self.consensus and lexical is not None and lexical == semantic:
+            decision = {"action": "AUTO_CORRECT", "corrected_name": lexical,
+                        "reasoning": "Rule of Consensus: the lexical and semantic agents suggest the same canonical value."}
+        elif self.high_confidence and max(score_lexical, score_semantic) > self.high_confidence_threshold:
+            decision = {"action": "AUTO_CORRECT", "corrected_name": lexical if score_lexical >= score_semantic else semantic,
+                        "reasoning": f"Rule of High Confidence: a score is above {self.high_confidence_threshold:.2f}."}
+        elif self.doubt and max(score_lexical, score_semantic) < self.doubt_ceiling:
+            decision = {"action": "FLAG_FOR_REVIEW", "corrected_name": None,
+                        "reasoning": "Rule of Doubt: the agents suggest different canonical values with low scores."}
 
-    # === STAGE 3: Decision Agent (Final Verdict) ===
-    # Compile all evidence into a dossier for the final agent
+        with self._lock:
+            if decision is None:
+                self.llm_calls_needed += 1
+            else:
+                self.llm_calls_saved += 1
+        return decision
+
+    def stats(self) -> Dict:
+        """How many LLM calls the local rules saved."""
+        return {"llm_calls_saved": self.llm_calls_saved, "llm_calls_needed": self.llm_calls_needed}
+
+DEFAULT_DECISION_RULES = DecisionRules()
+
+def _build_dossier(user_input: str, triage_result: Dict, semantic_result: Dict, field: Optional[str] = None,
+                   version: Optional[str] = None) -> Dict:
+    """Compiles all evidence into a dossier for the final agent."""
     dossier = {
         "user_input": user_input,
         **triage_result,
-        **semantic_result
+        **semantic_result,
+        "canonical_version": version # The canonical list the evidence was gathered against
     }
-    
-    final_decision = decision_agent.get_final_decision(dossier)
-    
-    # Combine results for a comprehensive final output
+    if field is not None:
+        # Tells the Decision Agent what kind of value it is judging
+        dossier["field"] = field
+    return dossier
+
+def _compile_result(dossier: Dict, final_decision: Dict, status: str = "RESOLVED_BY_LLM") -> Dict:
+    """Combines the final verdict with its evidence for a comprehensive final output."""
     return {
-        "status": "RESOLVED_BY_LLM",
+        "status": status,
         "action": final_decision.get("action"),
         "best_match": final_decision.get("corrected_name"),
         "reason": final_decision.get("reasoning"),
-        "evidence": dossier # Include all evidence for transparency
-    }
\ No newline at end of file
+        "evidence": dossier, # Include all evidence for transparency
+        # An offline or failing LLM is transient, so its fallback verdict must not be cached
+        "cacheable": not final_decision.get("fallback", False)
+    }
+
+def _alias_result(canonical_name: str, learned: bool) -> Dict:
+    """Verdict for an input resolved by the normalized-name index or a learned alias."""
+    return {
+        "status": "RESOLVED_BY_ALIAS",
+        "action": "AUTO_CORRECT",
+        "best_match": canonical_name,
+        "score": 1.0,
+        "reason": "Known alias approved by an admin." if learned else "Exact match after normalization."
+    }
+
+def _store(cache: Optional[ResolutionCache], user_input: str, result: Dict,
+           writes: Optional[List[Tuple[str, Dict]]] = None, version: Optional[str] = None) -> Dict:
+    """
+    Returns a fresh verdict, keeping it in the cache when it is worth it.
+    Verdicts that took the specialist agents are queued in `writes` and
+    saved with the rest of their stage in one transaction (see _save);
+    without `writes` (Triage Agent verdicts, which are cheap to redo) the
+    verdict only goes to the cache's memory tier, for canonical `version`.
+    """
+    cacheable = result.pop("cacheable", True) and result.get("status") != "REJECTED"
+    if cache is not None and cacheable:
+        if writes is None:
+            cache.put(user_input, result, version, persist=False)
+        else:
+            writes.append((user_input, result))
+    return result
+
+def _save(cache: Optional[ResolutionCache], writes: List[Tuple[str, Dict]], version: Optional[str]) -> None:
+    """
+    Writes a stage's queued verdicts to the cache in one transaction; the
+    cache drops them if the canonical list moved on from `version` meanwhile.
+    """
+    if cache is not None and writes:
+        cache.put_many(writes, version)
+
+def _run_local_stages(user_inputs: List[str], semantic_agent: SemanticSearchAgent,
+                      cache: Optional[ResolutionCache], rules: DecisionRules,
+                      timings: Optional[Dict[str, float]] = None, queued_at: Optional[float] = None,
+                      aliases: Optional[AliasTable] = None) -> Tuple[List[Optional[Dict]], List[Tuple[int, Dict]]]:
+    """
+    Runs every stage that executes on this machine (normalized names and
+    aliases, cache, triage, semantic search, local rules). This is the CPU-bound part of the pipeline.
+    Returns the results settled so far, in input order, and the
+    (position, dossier) pairs the Decision Agent still has to decide.
+    When a `timings` dict is given, seconds spent per stage are added to it;
+    `queued_at` is when the work was handed to an executor, so time spent
+    waiting for a free worker shows up as its own "queue" stage.
+    """
+    start = record_stage(timings, "queue", queued_at) if queued_at is not None else time.perf_counter()
+    # One read of the state, so a concurrent canonical-list update cannot mix two versions
+    state = semantic_agent.state
+    results, triage_results, escalated, start = _triage_stages(user_inputs, state, cache, timings, start, aliases)
+    if not escalated:
+        return results, []
+
+    # === STAGE 2: Semantic Agent (escalated subset, one encode call) ===
+    semantic_results = semantic_agent.find_best_matches([user_inputs[i] for i in escalated], timings)
+    start = record_stage(timings, "semantic", start)
+
+    # === STAGE 3: Local Decision Rules ===
+    undecided = _rule_stage(user_inputs, cache, rules, results, triage_results, escalated, semantic_results,
+                            version=state.version)
+    record_stage(timings, "rules", start)
+    return results, undecided
+
+def _triage_stages(user_inputs: List[str], state, cache: Optional[ResolutionCache], timings: Optional[Dict[str, float]],
+                   start: float, aliases: Optional[AliasTable] = None) -> Tuple[List[Optional[Dict]], Dict[int, Dict], List[int], float]:
+    """
+    Stages 0 and 1 (normalized names and aliases, resolution cache, Triage
+    Agent) against one canonical state. Returns the results settled so far,
+    the triage verdicts, the positions to escalate and the time the stages
+    finished.
+    """
+    results: List[Optional[Dict]] = [None] * len(user_inputs)
+    if cache is not None and cache.version != state.version:
+        # The canonical list changed (possibly through another worker): older verdicts no longer apply.
+        # A request that picked up the previous state just before a swap leaves the cache on the newer one.
+        cache.set_version(state.version, state.generation)
+
+    # === STAGE 0a: Normalized Names and Learned Aliases (hash lookups) ===
+    # Case, punctuation, suffix and abbreviation variants, and inputs an admin has already
+    # approved, resolve here without scoring anything. Runs before the cache, so a newly
+    # learned alias wins over a verdict cached before it was approved.
+    unresolved = []
+    for i, user_input in enumerate(user_inputs):
+        canonical_name = state.name_index.lookup(user_input)
+        if canonical_name is not None:
+            results[i] = _alias_result(canonical_name, learned=False)
+            continue
+        canonical_name = aliases.lookup(user_input, state.name_index) if aliases is not None else None
+        if canonical_name is not None:
+            results[i] = _alias_result(canonical_name, learned=True)
+        else:
+            unresolved.append(i)
+    start = record_stage(timings, "alias", start)
+
+    # === STAGE 0b: Resolution Cache ===
+    pending = []
+    for i in unresolved:
+        user_input = user_inputs[i]
+        cached_result = cache.get(user_input, state.version) if cache is not None else None
+        if cached_result is not None:
+            results[i] = cached_result
+        else:
+            pending.append(i)
+    if cache is not None:
+        start = record_stage(timings, "cache", start)
+
+    # === STAGE 1: Triage Agent (whole batch) ===
+    triage_results = dict(zip(pending, triage_agent.run_triage_batch(
+        [user_inputs[i] for i in pending], state.lexical_scorer, state.candidate_index
+    )))
+    escalated = []
+    for i, triage_result in triage_results.items():
+        if triage_result["status"] in ("RESOLVED", "REJECTED"):
+            # The case was simple and resolved by the Triage Agent, or the input was blank
+            results[i] = _store(cache, user_inputs[i], triage_result, version=state.version)
+        else:
+            escalated.append(i)
+    start = record_stage(timings, "triage", start)
+    return results, triage_results, escalated, start
+
+def _rule_stage(user_inputs: List[str], cache: Optional[ResolutionCache], rules: DecisionRules,
+                results: List[Optional[Dict]], triage_results: Dict[int, Dict], escalated: List[int],
+                semantic_results: List[Dict], field: Optional[str] = None,
+                version: Optional[str] = None) -> List[Tuple[int, Dict]]:
+    """Stage 3: settles what the local rules can in `results`; returns the (position, dossier) pairs left for the LLM."""
+    undecided, writes = [], []
+    for i, semantic_result in zip(escalated, semantic_results):
+        dossier = _build_dossier(user_inputs[i], triage_results[i], semantic_result, field, version)
+        rule_decision = rules.evaluate(dossier)
+        if rule_decision is not None:
+            results[i] = _store(cache, user_inputs[i], _compile_result(dossier, rule_decision, status="RESOLVED_BY_RULES"), writes)
+        else:
+            undecided.append((i, dossier))
+    _save(cache, writes, version)
+    return undecided
+
+def _count_outcomes(results: List[Dict]) -> List[Dict]:
+    """Counts every verdict by status and action for the metrics endpoint."""
+    for result in results:
+        METRICS.increment("results", status=result.get("status") or "UNKNOWN", action=result.get("action") or "NONE")
+    return results
+
+def _apply_decisions(user_inputs: List[str], cache: Optional[ResolutionCache], results: List[Optional[Dict]],
+                     undecided: List[Tuple[int, Dict]], decisions: List[Dict]) -> List[Dict]:
+    """Fills in the Decision Agent's verdicts for the cases the local stages left undecided."""
+    writes = []
+    for (i, dossier), final_decision in zip(undecided, decisions):
+        results[i] = _store(cache, user_inputs[i], _compile_result(dossier, final_decision), writes)
+    if undecided:
+        # Every dossier of one call was built against the same canonical state
+        _save(cache, writes, undecided[0][1]["canonical_version"])
+    return results
+
+def run_standardization_pipeline(user_input: str, semantic_agent: SemanticSearchAgent,
+                                 cache: Optional[ResolutionCache] = None, rules: Optional[DecisionRules] = None,
+                                 timings: Optional[Dict[str, float]] = None, aliases: Optional[AliasTable] = None) -> Dict:
+    """
+    Manages the full pipeline of agents to standardize a company name.
+    When a resolution cache is given, repeated inputs skip the agents entirely,
+    and inputs matching an alias learned from admin approvals resolve first.
+    """
+    return run_batch_standardization_pipeline([user_input], semantic_agent, cache, rules, timings, aliases)[0]
+
+def run_batch_standardization_pipeline(user_inputs: List[str], semantic_agent: SemanticSearchAgent,
+                                       cache: Optional[ResolutionCache] = None, rules: Optional[DecisionRules] = None,
+                                       timings: Optional[Dict[str, float]] = None,
+                                       aliases: Optional[AliasTable] = None) -> List[Dict]:
+    """
+    Batched version of run_standardization_pipeline for bulk records.
+    Triages the whole batch, sends only the escalated subset through one
+    batched encode and similarity search, and returns results in input order.
+    """
+    results, undecided = _run_local_stages(user_inputs, semantic_agent, cache, rules or DEFAULT_DECISION_RULES, timings,
+                                           aliases=aliases)
+
+    # === STAGE 4: Decision Agent (Final Verdict, micro-batched LLM calls) ===
+    # Goes through the shared micro-batcher so concurrent escalations share one LLM call
+    start = time.perf_counter()
+    batcher = decision_agent.get_batcher()
+    futures = [batcher.submit(dossier) for _, dossier in undecided]
+    decisions = decision_agent.wait_for_decisions(futures)
+    if undecided:
+        record_stage(timings, "decision", start)
+    return _count_outcomes(_apply_decisions(user_inputs, cache, results, undecided, decisions))
+
+async def run_batch_standardization_pipeline_async(user_inputs: List[str], semantic_agent: SemanticSearchAgent,
+                                                   executor: Executor, cache: Optional[ResolutionCache] = None,
+                                                   rules: Optional[DecisionRules] = None,
+                                                   timings: Optional[Dict[str, float]] = None,
+                                                   aliases: Optional[AliasTable] = None) -> List[Dict]:
+    """
+    Non-blocking version of run_batch_standardization_pipeline for the API.
+    The CPU-bound stages run on `executor`, and the Decision Agent is awaited
+    (with a timeout) instead of blocking the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    queued_at = time.perf_counter()
+    results, undecided = await loop.run_in_executor(
+        executor, _run_local_stages, user_inputs, semantic_agent, cache, rules or DEFAULT_DECISION_RULES, timings, queued_at, aliases
+    )
+    if not undecided:
+        return _count_outcomes(results)
+
+    # === STAGE 4: Decision Agent (awaited, micro-batched LLM calls) ===
+    start = time.perf_counter()
+    decisions = await asyncio.gather(*(decision_agent.get_final_decision_async(dossier) for _, dossier in undecided))
+    record_stage(timings, "decision", start)
+    # Storing verdicts touches the on-disk cache, so it goes back to the executor too
+    return _count_outcomes(await loop.run_in_executor(executor, _apply_decisions, user_inputs, cache, results, undecided, decisions))
+
+async def run_standardization_pipeline_async(user_input: str, semantic_agent: SemanticSearchAgent,
+                                             executor: Executor, cache: Optional[ResolutionCache] = None,
+                                             rules: Optional[DecisionRules] = None,
+                                             timings: Optional[Dict[str, float]] = None,
+                                             aliases: Optional[AliasTable] = None) -> Dict:
+    """Non-blocking version of run_standardization_pipeline for the API."""
+    return (await run_batch_standardization_pipeline_async([user_input], semantic_agent, executor, cache, rules, timings, aliases))[0]
+
+
+# --- Multi-Field Standardization ---
+# A record holds several fields (company, city, job title...), each standardized
+# against its own canonical list by its own agent. The agents share one encoder,
+# so the escalated values of every field are embedded in a single model call.
+
+class _FieldBatch:
+    """One field's slice of a batch of records, as it moves through the stages."""
+
+    def __init__(self, field: str, semantic_agent: SemanticSearchAgent, cache: Optional[ResolutionCache],
+                 positions: List[int], user_inputs: List[str]):
+        self.field = field
+        self.semantic_agent = semantic_agent
+        self.cache = cache
+        self.positions = positions  # Which records have a value for this field
+        self.user_inputs = user_inputs
+        self.state = semantic_agent.state
+
+def _run_multi_field_local_stages(records: List[Dict[str, str]], field_agents: Dict[str, SemanticSearchAgent],
+                                  caches: Optional[Dict[str, ResolutionCache]], rules: DecisionRules,
+                                  timings: Optional[Dict[str, float]] = None, queued_at: Optional[float] = None,
+                                  aliases: Optional[Dict[str, AliasTable]] = None) -> Tuple[List[Dict[str, Dict]], List[Tuple[Tuple[int, str], Dict]]]:
+    """
+    Multi-field version of _run_local_stages. Every field is triaged against
+    its own indexes; then the escalated values of all fields are encoded in
+    one call per shared encoder and searched in each field's vector index.
+    Returns one {field: result} dict per record and the
+    ((record position, field), dossier) pairs the Decision Agent still has
+    to decide.
+    """
+    unknown = {field for record in records for field in record} - set(field_agents)
+    if unknown:
+        raise ValueError(f"No agent for field(s): {', '.join(sorted(unknown))}")
+
+    start = record_stage(timings, "queue", queued_at) if queued_at is not None else time.perf_counter()
+    batches = []
+    for field, semantic_agent in field_agents.items():
+        positions = [i for i, record in enumerate(records) if field in record]
+        if positions:
+            batches.append(_FieldBatch(field, semantic_agent, (caches or {}).get(field), positions,
+                                       [records[i][field] for i in positions]))
+
+    # === STAGES 0-1: Normalized Names and Aliases, Resolution Cache and Triage Agent, per field ===
+    for batch in batches:
+        batch.results, batch.triage_results, batch.escalated, start = _triage_stages(
+            batch.user_inputs, batch.state, batch.cache, timings, start, (aliases or {}).get(batch.field)
+        )
+
+    # === STAGE 2: Semantic Agents (one encode call for every field sharing an encoder) ===
+    escalated = any(batch.escalated for batch in batches)
+    by_encoder: Dict[int, List[_FieldBatch]] = {}
+    for batch in batches:
+        if not batch.escalated:
+            continue
+        if hasattr(batch.semantic_agent, "encoder"):
+            by_encoder.setdefault(id(batch.semantic_agent.encoder), []).append(batch)
+        else:
+            # A client of the inference server encodes remotely, in its own call
+            batch.semantic_results = batch.semantic_agent.find_best_matches(
+                [batch.user_inputs[i] for i in batch.escalated], timings
+            )
+    for group in by_encoder.values():
+        embedding_start = time.perf_counter()
+        input_embeddings = group[0].semantic_agent.encode_queries(
+            [batch.user_inputs[i] for batch in group for i in batch.escalated]
+        )
+        record_stage(timings, "embedding", embedding_start)
+        offset = 0
+        for batch in group:
+            top_matches = batch.semantic_agent.search_embeddings(
+                input_embeddings[offset:offset + len(batch.escalated)], timings=timings, state=batch.state
+            )
+            batch.semantic_results = [best_match_result(matches) for matches in top_matches]
+            offset += len(batch.escalated)
+    if escalated:
+        start = record_stage(timings, "semantic", start)
+
+    # === STAGE 3: Local Decision Rules ===
+    results: List[Dict[str, Dict]] = [{} for _ in records]
+    undecided = []
+    for batch in batches:
+        if batch.escalated:
+            for i, dossier in _rule_stage(batch.user_inputs, batch.cache, rules, batch.results, batch.triage_results,
+                                          batch.escalated, batch.semantic_results, batch.field, batch.state.version):
+                undecided.append(((batch.positions[i], batch.field), dossier))
+        for position, result in zip(batch.positions, batch.results):
+            if result is not None:
+                results[position][batch.field] = result
+    if escalated:
+        record_stage(timings, "rules", start)
+    return results, undecided
+
+def _count_field_outcomes(results: List[Dict[str, Dict]]) -> List[Dict[str, Dict]]:
+    _count_outcomes([result for record_results in results for result in record_results.values()])
+    return results
+
+def _apply_field_decisions(records: List[Dict[str, str]], caches: Optional[Dict[str, ResolutionCache]],
+                           results: List[Dict[str, Dict]], undecided: List[Tuple[Tuple[int, str], Dict]],
+                           decisions: List[Dict]) -> List[Dict[str, Dict]]:
+    """Multi-field version of _apply_decisions."""
+    writes: Dict[str, List[Tuple[str, Dict]]] = {}
+    versions: Dict[str, str] = {}
+    for ((i, field), dossier), final_decision in zip(undecided, decisions):
+        results[i][field] = _store((caches or {}).get(field), records[i][field], _compile_result(dossier, final_decision),
+                                   writes.setdefault(field, []))
+        versions[field] = dossier["canonical_version"]
+    for field, field_writes in writes.items():
+        _save((caches or {}).get(field), field_writes, versions[field])
+    return results
+
+def run_multi_field_pipeline(records: List[Dict[str, str]], field_agents: Dict[str, SemanticSearchAgent],
+                             caches: Optional[Dict[str, ResolutionCache]] = None, rules: Optional[DecisionRules] = None,
+                             timings: Optional[Dict[str, float]] = None,
+                             aliases: Optional[Dict[str, AliasTable]] = None) -> List[Dict[str, Dict]]:
+    """
+    Standardizes every field of every record with that field's agent
+    (see src/core/entity_schema.py). Returns one {field: verdict} dict per
+    record, in input order; fields a record does not have are left out.
+    """
+    results, undecided = _run_multi_field_local_stages(records, field_agents, caches, rules or DEFAULT_DECISION_RULES, timings,
+                                                       aliases=aliases)
+
+    # === STAGE 4: Decision Agent (micro-batched across fields) ===
+    start = time.perf_counter()
+    batcher = decision_agent.get_batcher()
+    futures = [batcher.submit(dossier) for _, dossier in undecided]
+    decisions = decision_agent.wait_for_decisions(futures)
+    if undecided:
+        record_stage(timings, "decision", start)
+    return _count_field_outcomes(_apply_field_decisions(records, caches, results, undecided, decisions))
+
+async def run_multi_field_pipeline_async(records: List[Dict[str, str]], field_agents: Dict[str, SemanticSearchAgent],
+                                         executor: Executor, caches: Optional[Dict[str, ResolutionCache]] = None,
+                                         rules: Optional[DecisionRules] = None,
+                                         timings: Optional[Dict[str, float]] = None,
+                                         aliases: Optional[Dict[str, AliasTable]] = None) -> List[Dict[str, Dict]]:
+    """Non-blocking version of run_multi_field_pipeline for the API."""
+    loop = asyncio.get_running_loop()
+    queued_at = time.perf_counter()
+    results, undecided = await loop.run_in_executor(
+        executor, _run_multi_field_local_stages, records, field_agents, caches, rules or DEFAULT_DECISION_RULES, timings, queued_at,
+        aliases
+    )
+    if not undecided:
+        return _count_field_outcomes(results)
+
+    # === STAGE 4: Decision Agent (awaited, micro-batched across fields) ===
+    start = time.perf_counter()
+    decisions = await asyncio.gather(*(decision_agent.get_final_decision_async(dossier) for _, dossier in undecided))
+    record_stage(timings, "decision", start)
+    return _count_field_outcomes(await loop.run_in_executor(
+        executor, _apply_field_decisions, records, caches, results, undecided, decisions
+    ))
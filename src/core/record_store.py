@@ -0,0 +1,246 @@
+# src/core/record_store.py
+import csv
+import hashlib
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_STORE_PATH = "data/enterprise_records.sqlite3"
+DEFAULT_COMPANIES_CSV = "data/enterprise_companies.csv"
+DEFAULT_EMPLOYEES_CSV = "data/enterprise_employees.csv"
+BUSY_TIMEOUT_SECONDS = 30.0  # How long a writer waits for another process's write to finish
+COMPANY_COLUMNS = ["CompanyID", "CompanyName", "City", "State", "Country"]
+EMPLOYEE_COLUMNS = ["EmployeeID", "FirstName", "LastName", "Email", "Title", "CompanyID", "SubmittedCompanyName"]
+
+def _csv_key(path: str) -> str:
+    return f"imported:{os.path.abspath(path)}"
+
+def _file_hash(path: str) -> str:
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class RecordStore:
+    """
+    The companies and employees tables in one SQLite file, shared by the
+    Streamlit app and the API. Company lookups go through indexes on
+    CompanyName and CompanyID, and every write is a single-row insert, so
+    saving a record costs the same however large the tables grow. WAL mode
+    lets readers in other processes carry on while one of them writes.
+
+    A new store is seeded from the generated CSV files; after that the
+    store is the only copy of the records saved through the app and the
+    API, and the CSVs are only an import/export format. Opening a store
+    never changes rows it already holds: when the companies CSV changed
+    since it was imported (e.g. the generator was re-run) a notice is
+    printed, and import_csv (scripts/manage_records.py) brings it in.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH, companies_csv: Optional[str] = DEFAULT_COMPANIES_CSV,
+                 employees_csv: Optional[str] = DEFAULT_EMPLOYEES_CSV):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # Rows keep their insertion order (rowid), which is the order of the canonical list
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS companies ("
+            "CompanyID INTEGER NOT NULL UNIQUE, CompanyName TEXT NOT NULL, City TEXT, State TEXT, Country TEXT);"
+            "CREATE INDEX IF NOT EXISTS companies_name ON companies (CompanyName);"
+            "CREATE TABLE IF NOT EXISTS employees ("
+            "EmployeeID TEXT PRIMARY KEY, FirstName TEXT, LastName TEXT, Email TEXT, Title TEXT, "
+            "CompanyID INTEGER NOT NULL, SubmittedCompanyName TEXT);"
+            "CREATE INDEX IF NOT EXISTS employees_company ON employees (CompanyID);"
+            # Inputs an admin approved, per standardized field, and the canonical value they stand for
+            "CREATE TABLE IF NOT EXISTS aliases ("
+            "Field TEXT NOT NULL, Alias TEXT NOT NULL, CanonicalName TEXT NOT NULL, PRIMARY KEY (Field, Alias));"
+            # Bookkeeping, e.g. the hash of the companies CSV the tables were last imported from
+            "CREATE TABLE IF NOT EXISTS meta (Key TEXT PRIMARY KEY, Value TEXT);"
+        )
+        self._seed(companies_csv, employees_csv)
+
+    def _seed(self, companies_csv: Optional[str], employees_csv: Optional[str]) -> None:
+        """
+        Imports the CSV files into an empty store, in one transaction so
+        concurrent openers import once. A store that already has companies
+        is left as it is, even when the CSV changed.
+        """
+        if not companies_csv or not os.path.exists(companies_csv):
+            return
+        csv_key, fingerprint = _csv_key(companies_csv), _file_hash(companies_csv)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                imported = self._db.execute("SELECT Value FROM meta WHERE Key = ?", (csv_key,)).fetchone()
+                if self._db.execute("SELECT 1 FROM companies LIMIT 1").fetchone() is None:
+                    self._import(companies_csv, employees_csv, fingerprint)
+                elif imported is None:
+                    # A store filled before hashes were recorded adopts the CSV as it is
+                    self._db.execute("INSERT INTO meta VALUES (?, ?)", (csv_key, fingerprint))
+                elif imported[0] != fingerprint:
+                    print(f"RecordStore: '{companies_csv}' changed since it was imported into '{self.path}'; "
+                          f"run `python scripts/manage_records.py import` to bring in its new rows.")
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _import(self, companies_csv: str, employees_csv: Optional[str], fingerprint: str) -> None:
+        """Inserts the CSV rows whose CompanyID / EmployeeID the store does not have yet (caller holds the lock and transaction)."""
+        with open(companies_csv, newline="") as f:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO companies VALUES (?, ?, ?, ?, ?)",
+                ([row[column] for column in COMPANY_COLUMNS] for row in csv.DictReader(f))
+            )
+        if employees_csv and os.path.exists(employees_csv):
+            with open(employees_csv, newline="") as f:
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO employees VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ([row[column] for column in EMPLOYEE_COLUMNS] for row in csv.DictReader(f))
+                )
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (_csv_key(companies_csv), fingerprint))
+        print(f"RecordStore: Imported '{companies_csv}' into '{self.path}'.")
+
+    def import_csv(self, companies_csv: str = DEFAULT_COMPANIES_CSV, employees_csv: Optional[str] = DEFAULT_EMPLOYEES_CSV,
+                   replace: bool = False) -> None:
+        """
+        Imports the CSV files on request. By default only companies and
+        employees whose IDs are not in the store yet are added, so records
+        saved since the last import are kept; with `replace` both tables
+        are emptied first and hold exactly the CSVs' rows afterwards.
+        """
+        fingerprint = _file_hash(companies_csv)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    self._db.execute("DELETE FROM companies")
+                    self._db.execute("DELETE FROM employees")
+                self._import(companies_csv, employees_csv, fingerprint)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def company_names(self) -> List[str]:
+        """The canonical company names, in list order."""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT CompanyName FROM companies ORDER BY rowid")]
+
+    def company_ids(self) -> Dict[str, int]:
+        """Name -> CompanyID for the whole list (the first company wins if a name repeats)."""
+        with self._lock:
+            rows = self._db.execute("SELECT CompanyName, CompanyID FROM companies ORDER BY rowid DESC").fetchall()
+        return dict(rows)
+
+    def distinct_values(self, table: str, column: str) -> List[str]:
+        """
+        The distinct non-empty values of one column, in order of first
+        appearance: the canonical list for fields other than the company name.
+        """
+        if column not in {"companies": COMPANY_COLUMNS, "employees": EMPLOYEE_COLUMNS}.get(table, ()):
+            raise ValueError(f"Unknown column '{table}.{column}'.")
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL AND {column} != '' "
+                f"GROUP BY {column} ORDER BY MIN(rowid)"
+            )]
+
+    def company_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM companies").fetchone()[0]
+
+    def company_id(self, company_name: str) -> Optional[int]:
+        """Indexed lookup of a company's ID by its canonical name; None if it is not on the list."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT CompanyID FROM companies WHERE CompanyName = ? ORDER BY rowid LIMIT 1", (company_name,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def add_company(self, company_name: str, city: str = "", state: str = "", country: str = "") -> int:
+        """
+        Appends a company and returns its new CompanyID. The ID is allocated
+        inside the insert itself, so two writers can never get the same one.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO companies (CompanyID, CompanyName, City, State, Country) "
+                "SELECT COALESCE(MAX(CompanyID), 0) + 1, ?, ?, ?, ? FROM companies",
+                (company_name, city, state, country)
+            )
+            return self._db.execute("SELECT CompanyID FROM companies WHERE rowid = ?", (cursor.lastrowid,)).fetchone()[0]
+
+    def add_employee(self, first_name: str, last_name: str, company_name: str, submitted_company_name: str,
+                     title: str = "Newly Registered") -> Optional[str]:
+        """
+        Records an employee against the named company. Returns the new
+        EmployeeID, or None when the company is not on the canonical list.
+        """
+        company_id = self.company_id(company_name)
+        if company_id is None:
+            return None
+        employee_id = str(uuid.uuid4())
+        self.add_employees([{
+            "EmployeeID": employee_id, "FirstName": first_name, "LastName": last_name,
+            "Email": f"{first_name.lower()}.{last_name.lower()}@example.com", "Title": title,
+            "CompanyID": company_id, "SubmittedCompanyName": submitted_company_name
+        }])
+        return employee_id
+
+    def add_employees(self, employees: Iterable[Dict]) -> None:
+        """Inserts employee rows (dicts with the CSV columns) in one transaction."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.executemany(
+                    "INSERT INTO employees VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ([employee[column] for column in EMPLOYEE_COLUMNS] for employee in employees)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def aliases(self, field: str = "company") -> Dict[str, str]:
+        """Every learned alias of one field, alias -> canonical value."""
+        with self._lock:
+            return dict(self._db.execute("SELECT Alias, CanonicalName FROM aliases WHERE Field = ?", (field,)))
+
+    def add_alias(self, alias: str, canonical_name: str, field: str = "company") -> None:
+        """Records (or re-points) an alias learned from an admin approval."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?, ?)", (field, alias, canonical_name))
+
+    def export_csv(self, companies_csv: str = DEFAULT_COMPANIES_CSV, employees_csv: str = DEFAULT_EMPLOYEES_CSV) -> None:
+        """
+        Writes both tables back out in the generator's CSV layout, streaming
+        rows rather than loading them. The exported companies CSV is recorded
+        as imported, so opening the store with it does not re-import it.
+        """
+        for path, table, columns in ((companies_csv, "companies", COMPANY_COLUMNS), (employees_csv, "employees", EMPLOYEE_COLUMNS)):
+            with self._lock, open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                writer.writerows(self._db.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid"))
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (_csv_key(companies_csv), _file_hash(companies_csv)))
+
+def load_company_list(record_store: RecordStore, companies_csv: Optional[str] = None) -> Tuple[List[str], Dict[str, int]]:
+    """
+    The canonical company names (in list order) and name -> CompanyID, read
+    from `companies_csv` when one is given and otherwise from the store,
+    which also has the companies confirmed in the UI since the CSV was
+    generated. As in company_ids, the first company wins if a name repeats.
+    """
+    if not companies_csv:
+        return record_store.company_names(), record_store.company_ids()
+    with open(companies_csv, newline="") as f:
+        rows = [(row["CompanyName"], int(row["CompanyID"])) for row in csv.DictReader(f)]
+    return [name for name, _ in rows], dict(reversed(rows))
@@ -0,0 +1,146 @@
+# src/core/resolution_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_CACHE_PATH = "data/resolution_cache.sqlite3"
+DEFAULT_MEMORY_SIZE = 10_000  # Entries kept in the in-memory LRU tier
+
+def normalize_input(user_input: str) -> str:
+    """Casefolds and collapses whitespace so trivial variants share one cache entry."""
+    return " ".join(user_input.casefold().split())
+
+def canonical_list_version(canonical_names: List[str]) -> str:
+    """Fingerprint of the canonical list; cached verdicts are only valid for the list that produced them."""
+    return hashlib.sha256("\n".join(canonical_names).encode("utf-8")).hexdigest()[:16]
+
+class ResolutionCache:
+    """
+    Two-tier cache of pipeline verdicts keyed on the normalized input and
+    the canonical list version: an in-memory LRU in front of a SQLite table
+    that survives restarts. Binding a new version drops every entry that was
+    computed against another version of the list; lookups and writes made
+    for any version but the bound one miss and are dropped, so a request
+    still running against the previous list can neither read nor store
+    verdicts under the new one. Caches for different
+    fields share one file but each keeps its own `table`, since their
+    canonical lists (and versions) are independent. The file is in WAL mode
+    and verdicts are written in batches (put_many), so saving a batch costs
+    one commit rather than one fsync per verdict.
+    """
+
+    def __init__(self, version: str, path: Optional[str] = DEFAULT_CACHE_PATH, memory_size: int = DEFAULT_MEMORY_SIZE,
+                 table: str = "resolutions"):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table!r}")
+        self.table = table
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.misses = 0
+        self.version: Optional[str] = None
+        self._generation = -1
+
+        self._db = sqlite3.connect(path, check_same_thread=False) if path else None
+        if self._db is not None:
+            # Losing the last few verdicts in a power cut is fine for a cache; a sync per commit is not
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "version TEXT NOT NULL, input_key TEXT NOT NULL, result TEXT NOT NULL, "
+                "PRIMARY KEY (version, input_key))"
+            )
+            self._db.commit()
+        self.set_version(version)
+
+    def set_version(self, version: str, generation: Optional[int] = None) -> None:
+        """
+        Binds the cache to a canonical list version and invalidates entries
+        from any other version. With the `generation` of the state the
+        version belongs to, a state older than the one already bound is
+        ignored, so the cache never moves back to a replaced list.
+        """
+        with self._lock:
+            if generation is not None:
+                if generation < self._generation:
+                    return
+                self._generation = generation
+            if version == self.version:
+                return
+            self.version = version
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table} WHERE version != ?", (version,))
+                self._db.commit()
+
+    def get(self, user_input: str, version: Optional[str] = None) -> Optional[Dict]:
+        """Returns the cached verdict for the input, or None on a miss (always one for another `version`)."""
+        key = normalize_input(user_input)
+        with self._lock:
+            if version is not None and version != self.version:
+                self.misses += 1
+                return None
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            row = None
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT result FROM {self.table} WHERE version = ? AND input_key = ?", (self.version, key)
+                ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            result = json.loads(row[0])
+            self._remember(key, result)
+            return result
+
+    def put(self, user_input: str, result: Dict, version: Optional[str] = None, persist: bool = True) -> None:
+        """Stores a verdict in both tiers (only in memory without `persist`)."""
+        self.put_many([(user_input, result)], version, persist)
+
+    def put_many(self, items: Iterable[Tuple[str, Dict]], version: Optional[str] = None, persist: bool = True) -> None:
+        """
+        Stores several verdicts in the memory tier and, with `persist`, in the
+        SQLite table with one executemany and a single commit. Verdicts
+        computed against a `version` other than the bound one are dropped.
+        """
+        entries = [(normalize_input(user_input), result) for user_input, result in items]
+        rows = [(key, json.dumps(result)) for key, result in entries] if persist and self._db is not None else []
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            for key, result in entries:
+                self._remember(key, result)
+            if rows:
+                self._db.executemany(
+                    f"INSERT OR REPLACE INTO {self.table} (version, input_key, result) VALUES (?, ?, ?)",
+                    [(self.version, key, result) for key, result in rows]
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, result: Dict) -> None:
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for the health endpoint."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "version": self.version,
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
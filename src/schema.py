@@ -1,15 +1,36 @@
 # src/schema.py
-from pydantic import BaseModel
-from typing import Optional, Dict
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, List
+
+MAX_BATCH_ITEMS = 1000 # Names (or records) accepted per batch call; larger jobs belong in scripts/standardize_csv.py
 
 class StandardizationRequest(BaseModel):
     """The request model for a standardization task."""
     company_name: str # Only the company name is needed by the backend logic
+    include_timings: bool = False # Adds a per-stage timing breakdown (ms) to the evidence
 
 class StandardizationResponse(BaseModel):
     """The response model containing the agent squad's verdict."""
     status: str
-    action: str
+    action: Optional[str] = None # Rejected inputs have no action
     best_match: Optional[str] = None
     reason: Optional[str] = None
-    evidence: Optional[Dict] = None
\ No newline at end of file
+    evidence: Optional[Dict] = None
+
+class StandardizationBatchRequest(BaseModel):
+    """The request model for standardizing many company names in one call."""
+    company_names: List[str] = Field(..., max_length=MAX_BATCH_ITEMS)
+    include_timings: bool = False # Adds the batch's per-stage timing breakdown (ms) to each verdict's evidence
+
+class StandardizationBatchResponse(BaseModel):
+    """The response model with one verdict per submitted name, in input order."""
+    results: List[StandardizationResponse]
+
+class StandardizationRecordsRequest(BaseModel):
+    """The request model for standardizing several fields of each record in one call."""
+    records: List[Dict[str, str]] = Field(..., max_length=MAX_BATCH_ITEMS) # e.g. [{"company": "Apex Financial Grp", "city": "new york"}]; keys are entity schema fields
+    include_timings: bool = False # Adds the batch's per-stage timing breakdown (ms) to each verdict's evidence
+
+class StandardizationRecordsResponse(BaseModel):
+    """The response model with one {field: verdict} dict per submitted record, in input order."""
+    results: List[Dict[str, StandardizationResponse]]
\ No newline at end of file